@@ -0,0 +1,134 @@
+import asyncio
+import os
+import time
+from typing import List
+import aiohttp
+from comment_chain import CommentChainResolver
+
+# the bots' reddit calls on asyncio: chain fetches and replies share one pooled
+# aiohttp session per worker with the uploads. The base urls can point at a
+# local stand-in (see benchmarks/aio.py).
+reddit_api_url = os.environ.get("reddit_api_url", "https://oauth.reddit.com")
+reddit_auth_url = os.environ.get(
+    "reddit_auth_url", "https://www.reddit.com/api/v1/access_token"
+)
+http_connections = int(os.environ.get("http_connections", 32))
+http_per_host = int(os.environ.get("http_per_host", 4))
+
+user_agent = "/u/objection-bot v0.1"
+
+
+def new_session():
+    connector = aiohttp.TCPConnector(
+        limit=http_connections, limit_per_host=http_per_host, ttl_dns_cache=300
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        headers={"User-Agent": user_agent},
+        timeout=aiohttp.ClientTimeout(total=600),
+    )
+
+
+class Author:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class Comment:
+    # the fields anim and the chain resolver read, from reddit's json; plain
+    # attributes so it pickles into the render processes
+    def __init__(self, data):
+        self.id = data["id"]
+        self.fullname = data["name"]
+        self.parent_id = data["parent_id"]
+        self.body = data["body"]
+        self.score = data["score"]
+        self.author = Author(data["author"])
+        self.permalink = data.get("permalink", "")
+
+
+class AsyncReddit:
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        client_id: str,
+        client_secret: str,
+        refresh_token: str,
+        chain_resolver: CommentChainResolver = None,
+    ):
+        self.session = session
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_token = refresh_token
+        self.chain_resolver = chain_resolver or CommentChainResolver()
+        self.access_token = None
+        self.expires = 0
+        self.token_lock = asyncio.Lock()
+
+    async def token(self):
+        async with self.token_lock:
+            auth = aiohttp.BasicAuth(self.client_id or "", self.client_secret or "")
+            if self.access_token is None or time.time() > self.expires - 60:
+                async with self.session.post(
+                    reddit_auth_url,
+                    auth=auth,
+                    data={
+                        "grant_type": "refresh_token",
+                        "refresh_token": self.refresh_token,
+                    },
+                ) as response:
+                    response.raise_for_status()
+                    data = await response.json()
+                self.access_token = data["access_token"]
+                self.expires = time.time() + data.get("expires_in", 3600)
+            return self.access_token
+
+    async def request(self, method: str, path: str, **kwargs):
+        headers = {"Authorization": f"bearer {await self.token()}"}
+        async with self.session.request(
+            method, f"{reddit_api_url}{path}", headers=headers, **kwargs
+        ) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def info(self, fullnames: List[str]) -> List[Comment]:
+        data = await self.request(
+            "GET", "/api/info", params={"id": ",".join(fullnames), "raw_json": 1}
+        )
+        return [
+            Comment(child["data"])
+            for child in data["data"]["children"]
+            if child["kind"] == "t1"
+        ]
+
+    async def comment(self, comment_id: str) -> Comment:
+        comments = await self.info([f"t1_{comment_id}"])
+        if len(comments) == 0:
+            raise LookupError(f"comment {comment_id} not found")
+        return comments[0]
+
+    async def get_chain(self, comment: Comment) -> List[Comment]:
+        resolver = self.chain_resolver
+        walk = resolver.walk([comment])
+        try:
+            while True:
+                missing = next(walk)
+                fetched = await asyncio.gather(
+                    *(self.info(batch) for batch in resolver.batches(missing))
+                )
+                for comments in fetched:
+                    for parent in comments:
+                        resolver.remember(parent)
+        except StopIteration as done:
+            return done.value[0]
+
+    async def reply(self, fullname: str, text: str):
+        data = await self.request(
+            "POST",
+            "/api/comment",
+            data={"thing_id": fullname, "text": text, "api_type": "json"},
+        )
+        errors = data.get("json", {}).get("errors", [])
+        if len(errors) > 0:
+            raise RuntimeError(f"reply to {fullname} failed: {errors}")
+        return data
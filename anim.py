@@ -1,23 +1,43 @@
-from PIL import Image, ImageDraw, ImageFont
-from matplotlib.pyplot import imshow
+from PIL import Image, ImageColor, ImageDraw, ImageFont
 import numpy as np
 import cv2
-from typing import List, Dict
+from typing import List, Dict, Iterable, NamedTuple
 import random
 import os
+import copy
+import functools
+import itertools
+import multiprocessing
+import shutil
+import tempfile
+import threading
 import random as r
 from pydub import AudioSegment
-import moviepy.editor as mpe
 from enum import IntEnum
 import ffmpeg
-from collections import Counter
+from collections import Counter, OrderedDict
 import random
 from textwrap import wrap
-import spacy
-from textblob import TextBlob, exceptions
 import re
+import asset_pack
+import metrics
+import render_cache
+import sentiment
 
-nlp = spacy.load("en_core_web_sm")
+
+@functools.lru_cache(maxsize=None)
+def get_nlp(sentencizer: bool = False):
+    # spaCy takes seconds to import and load, only pay for it when
+    # comments actually need to be split into sentences
+    import spacy
+
+    if sentencizer:
+        # rule based sentence splitting only, no statistical model at all
+        nlp = spacy.blank("en")
+        nlp.add_pipe(nlp.create_pipe("sentencizer"))
+        return nlp
+    # only the parser is needed for the sentence boundaries
+    return spacy.load("en_core_web_sm", disable=["tagger", "ner"])
 
 
 class Location(IntEnum):
@@ -65,6 +85,116 @@ def add_margin(pil_img, top, right, bottom, left):
     return result
 
 
+def image_nbytes(value):
+    if isinstance(value, Image.Image):
+        return value.size[0] * value.size[1] * len(value.getbands())
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        return sum(image_nbytes(item) for item in value)
+    return 0
+
+
+class AssetCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, load):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
+        self.misses += 1
+        value = load()
+        nbytes = image_nbytes(value)
+        self.entries[key] = (value, nbytes)
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes and len(self.entries) > 1:
+            _, (_, evicted_nbytes) = self.entries.popitem(last=False)
+            self.nbytes -= evicted_nbytes
+        return value
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "nbytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def premultiply(frame: Image):
+    # BGR colour already multiplied by alpha plus the inverse alpha, cropped
+    # to the visible part of the sprite, ready for alpha_blend
+    rgba = np.asarray(frame.convert("RGBA"))
+    ys, xs = np.nonzero(rgba[..., 3])
+    if len(xs) == 0:
+        x0 = y0 = 0
+        rgba = rgba[:0, :0]
+    else:
+        x0, y0 = int(xs.min()), int(ys.min())
+        rgba = rgba[y0 : ys.max() + 1, x0 : xs.max() + 1]
+    alpha = rgba[..., 3:].astype(np.uint16)
+    src = rgba[..., 2::-1].astype(np.uint16) * alpha
+    return x0, y0, src, 255 - alpha
+
+
+def alpha_blend(
+    buffer: np.ndarray,
+    x: int,
+    y: int,
+    src: np.ndarray,
+    inv_alpha: np.ndarray,
+    clip=None,
+):
+    # the same integer maths as Image.paste with a mask:
+    # out = (dst * (255 - alpha) + src * alpha) / 255, rounded
+    # only the pixels inside clip (x0, y0, x1, y1) are touched
+    buf_h, buf_w = buffer.shape[:2]
+    if clip is None:
+        clip = (0, 0, buf_w, buf_h)
+    clip_x0, clip_y0, clip_x1, clip_y1 = clip
+    x0, y0 = max(x, clip_x0), max(y, clip_y0)
+    x1, y1 = min(x + src.shape[1], clip_x1), min(y + src.shape[0], clip_y1)
+    if x0 >= x1 or y0 >= y1:
+        return
+    region = (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+    dst = buffer[y0:y1, x0:x1]
+    tmp = dst * inv_alpha[region].astype(np.uint32) + src[region] + 128
+    dst[...] = ((tmp >> 8) + tmp) >> 8
+
+
+def union_rect(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def rect_slices(rect):
+    x0, y0, x1, y1 = rect
+    return slice(y0, y1), slice(x0, x1)
+
+
+def to_bgr(frame: Image):
+    if frame.mode == "RGBA":
+        return cv2.cvtColor(np.asarray(frame), cv2.COLOR_RGBA2BGR)
+    return cv2.cvtColor(np.asarray(frame.convert("RGB")), cv2.COLOR_RGB2BGR)
+
+
+asset_cache = AssetCache(int(os.environ.get("asset_cache_mb", 512)) * 1024 * 1024)
+
+
 class AnimImg:
     def __init__(
         self,
@@ -83,50 +213,73 @@ class AnimImg:
         self.x = x
         self.y = y
         self.path = path
-        img = Image.open(path, "r")
-        if img.format == "GIF" and img.is_animated:
-            self.frames = []
-            for idx in range(img.n_frames):
-                img.seek(idx)
-                self.frames.append(self.resize(img, w=w, h=h).convert("RGBA"))
-        elif key_x is not None:
-            self.frames = []
-            for x_pad in range(key_x):
-                self.frames.append(
-                    add_margin(
-                        self.resize(img, w=w, h=h).convert("RGBA"), 0, 0, 0, x_pad
-                    )
-                )
-            if key_x_reverse:
-                for x_pad in reversed(range(key_x)):
-                    self.frames.append(
-                        add_margin(
-                            self.resize(img, w=w, h=h).convert("RGBA"), 0, 0, 0, x_pad
-                        )
-                    )
-        else:
-            self.frames = [self.resize(img, w=w, h=h).convert("RGBA")]
+        self.key = (path, w, h, key_x, key_x_reverse)
+        # decoded frames are shared between every AnimImg of the same asset,
+        # so they must never be drawn on
+        self.frames = asset_cache.get(
+            self.key,
+            lambda: self.load_frames(
+                path, w=w, h=h, key_x=key_x, key_x_reverse=key_x_reverse
+            ),
+        )
         self.w = self.frames[0].size[0]
         self.h = self.frames[0].size[1]
         self.shake_effect = shake_effect
         self.half_speed = half_speed
         self.repeat = repeat
+        # set by the scene being drawn, see AnimScene.seed_layers
+        self.rng = None
 
-    def resize(self, frame, *, w: int = None, h: int = None):
+    @staticmethod
+    def load_frames(
+        path: str,
+        *,
+        w: int = None,
+        h: int = None,
+        key_x: int = None,
+        key_x_reverse: bool = True,
+    ):
+        frames = []
+        pack = asset_pack.default_pack()
+        if pack is not None and path in pack.images:
+            sources, animated = pack.image(path)
+            for frame, resample in sources:
+                frames.append(AnimImg.resize(frame, w=w, h=h, resample=resample))
+        else:
+            with Image.open(path, "r") as img:
+                animated = img.format == "GIF" and img.is_animated
+                for idx in range(img.n_frames if animated else 1):
+                    img.seek(idx)
+                    frames.append(AnimImg.resize(img, w=w, h=h).convert("RGBA"))
+        if animated or key_x is None:
+            return frames
+        _img = frames[0]
+        frames = [add_margin(_img, 0, 0, 0, x_pad) for x_pad in range(key_x)]
+        if key_x_reverse:
+            for x_pad in reversed(range(key_x)):
+                frames.append(add_margin(_img, 0, 0, 0, x_pad))
+        return frames
+
+    @staticmethod
+    def resize(frame, *, w: int = None, h: int = None, resample: int = None):
         if w is not None and h is not None:
+            if resample is not None:
+                return frame.resize((w, h), resample)
             return frame.resize((w, h))
         else:
+            if resample is None:
+                resample = Image.ANTIALIAS
             if w is not None:
                 w_perc = w / float(frame.size[0])
                 _h = int((float(frame.size[1]) * float(w_perc)))
-                return frame.resize((w, _h), Image.ANTIALIAS)
+                return frame.resize((w, _h), resample)
             if h is not None:
                 h_perc = h / float(frame.size[1])
                 _w = int((float(frame.size[0]) * float(h_perc)))
-                return frame.resize((_w, h), Image.ANTIALIAS)
+                return frame.resize((_w, h), resample)
         return frame
 
-    def render(self, background: Image = None, frame: int = 0):
+    def frame_index(self, frame: int = 0):
         if frame > len(self.frames) - 1:
             if self.repeat:
                 frame = frame % len(self.frames)
@@ -134,25 +287,62 @@ class AnimImg:
                 frame = len(self.frames) - 1
         if self.half_speed and self.repeat:
             frame = int(frame / 2)
-        _img = self.frames[frame]
+        return frame
+
+    def offset(self):
+        if self.shake_effect:
+            rng = self.rng if self.rng is not None else r
+            return (self.x + rng.randint(-1, 1), self.y + rng.randint(-1, 1))
+        return (self.x, self.y)
+
+    def render(self, background: Image = None, frame: int = 0):
+        _img = self.frames[self.frame_index(frame)]
         if background is None:
             _w, _h = _img.size
             _background = Image.new("RGBA", (_w, _h), (255, 255, 255, 255))
         else:
             _background = background
-        bg_w, bg_h = _background.size
-        offset = (self.x, self.y)
-        if self.shake_effect:
-            offset = (self.x + r.randint(-1, 1), self.y + r.randint(-1, 1))
-        _background.paste(_img, offset, mask=_img)
+        _background.paste(_img, self.offset(), mask=_img)
         if background is None:
             return _background
 
+    def premultiplied(self):
+        return asset_cache.get(
+            ("premultiplied", *self.key),
+            lambda: [premultiply(frame) for frame in self.frames],
+        )
+
+    def blend(self, buffer: np.ndarray, frame: int = 0, clip=None):
+        bbox_x, bbox_y, src, inv_alpha = self.premultiplied()[self.frame_index(frame)]
+        x, y = self.offset()
+        alpha_blend(buffer, x + bbox_x, y + bbox_y, src, inv_alpha, clip)
+
+    def extent(self, frame_index: int):
+        # the pixels a frame of the sprite covers when it isn't shaking
+        bbox_x, bbox_y, src, _ = self.premultiplied()[frame_index]
+        x, y = self.x + bbox_x, self.y + bbox_y
+        return (x, y, x + src.shape[1], y + src.shape[0])
+
     def __str__(self):
         return self.path
 
 
+@functools.lru_cache(maxsize=None)
+def get_font(path: str = None, size: int = 12):
+    if path is None:
+        return ImageFont.load_default()
+    return ImageFont.truetype(path, size)
+
+
+@functools.lru_cache(maxsize=None)
+def get_line_height(path: str = None, size: int = 12, spacing: int = 4):
+    # same line spacing as ImageDraw.multiline_text
+    draw = ImageDraw.Draw(Image.new("L", (1, 1)))
+    return draw.textsize("A", font=get_font(path, size))[1] + spacing
+
+
 class AnimText:
+
     def __init__(
         self,
         text: str,
@@ -171,65 +361,609 @@ class AnimText:
         self.font_path = font_path
         self.font_size = font_size
         self.colour = colour
+        self._layer = None
+        self._layer_bbox = None
+        self._revealed = 0
+        # (x, y, text) the last text_layer call drew, None if it redrew it all
+        self._drawn = []
 
-    def render(self, background: Image, frame: int = 0):
-        draw = ImageDraw.Draw(background)
-        _text = self.text
+    def visible_length(self, frame: int = 0):
         if self.typewriter_effect:
-            _text = _text[:frame]
-        if self.font_path is not None:
-            font = ImageFont.truetype(self.font_path, self.font_size)
-            draw.text((self.x, self.y), _text, font=font, fill=self.colour)
-        else:
-            draw.text((self.x, self.y), _text, fill=self.colour)
+            return len(self.text[:frame])
+        return len(self.text)
+
+    def text_layer(self, size, length: int):
+        # glyph coverage mask of self.text[:length], drawn incrementally:
+        # only the glyphs revealed since the last call are rasterised
+        self._drawn = []
+        if (
+            self._layer is None
+            or self._layer.size != size
+            or length < self._revealed
+        ):
+            self._layer = Image.new("L", size, 0)
+            self._layer_bbox = None
+            self._revealed = 0
+            self._drawn = None
+        if length > self._revealed and self.font_path is None:
+            # the default bitmap font can't measure glyph advances, redraw it all
+            self._layer = Image.new("L", size, 0)
+            draw = ImageDraw.Draw(self._layer)
+            draw.text((self.x, self.y), self.text[:length], fill=255)
+            self._revealed = length
+            self._layer_bbox = self._layer.getbbox()
+            self._drawn = None
+        elif length > self._revealed:
+            font = get_font(self.font_path, self.font_size)
+            draw = ImageDraw.Draw(self._layer)
+            line_height = get_line_height(self.font_path, self.font_size)
+            lines = self.text[:length].split("\n")
+            start = self._revealed
+            line_start = 0
+            for line_idx, line in enumerate(lines):
+                line_end = line_start + len(line)
+                if line_end > start:
+                    col = max(start - line_start, 0)
+                    x = self.x + font.getlength(line[:col])
+                    y = self.y + line_idx * line_height
+                    draw.text((x, y), line[col:], font=font, fill=255)
+                    if self._drawn is not None:
+                        self._drawn.append((x, y, line[col:]))
+                line_start = line_end + 1
+            self._revealed = length
+            self._layer_bbox = self._layer.getbbox()
+        return self._layer, self._layer_bbox
+
+    def changed(self, size):
+        # the part of the layer the last text_layer call drew on
+        if self._drawn is None:
+            return (0, 0, *size)
+        font = get_font(self.font_path, self.font_size)
+        rect = None
+        for x, y, text in self._drawn:
+            # a pixel of slack for where the fractional x lands
+            left, top, right, bottom = font.getbbox(text)
+            glyphs = (
+                int(x + left) - 1,
+                int(y + top) - 1,
+                int(x + right) + 2,
+                int(y + bottom) + 2,
+            )
+            rect = union_rect(rect, glyphs)
+        return rect
+
+    @property
+    def ink(self):
+        return self.colour if self.colour is not None else "#ffffff"
+
+    def render(self, background: Image, frame: int = 0):
+        layer, bbox = self.text_layer(background.size, self.visible_length(frame))
+        if bbox is not None:
+            background.paste(self.ink, bbox, layer.crop(bbox))
         return background
 
+    def blend(self, buffer: np.ndarray, frame: int = 0, clip=None):
+        size = (buffer.shape[1], buffer.shape[0])
+        layer, bbox = self.text_layer(size, self.visible_length(frame))
+        if bbox is None:
+            return
+        x0, y0, x1, y1 = bbox
+        if clip is not None:
+            x0, y0 = max(x0, clip[0]), max(y0, clip[1])
+            x1, y1 = min(x1, clip[2]), min(y1, clip[3])
+            if x0 >= x1 or y0 >= y1:
+                return
+        mask = np.asarray(layer)[y0:y1, x0:x1, None].astype(np.uint32)
+        ink = np.array(ImageColor.getrgb(self.ink)[2::-1], dtype=np.uint32)
+        alpha_blend(buffer, x0, y0, mask * ink, 255 - mask)
+
     def __str__(self):
         return self.text
 
 
+def is_cacheable_layer(obj):
+    if isinstance(obj, AnimImg):
+        return not obj.shake_effect
+    if isinstance(obj, AnimText):
+        return not obj.typewriter_effect
+    return isinstance(obj, Image.Image)
+
+
+def layer_state(obj, frame: int = 0):
+    if isinstance(obj, AnimImg):
+        return obj.frame_index(frame)
+    if isinstance(obj, AnimText):
+        return obj.visible_length(frame)
+    return None
+
+
 class AnimScene:
-    def __init__(self, arr: List, length: int, start_frame: int = 0):
-        self.frames = []
+    def __init__(
+        self,
+        arr: List,
+        length: int,
+        start_frame: int = 0,
+        lazy: bool = False,
+        segment=None,
+        seed: int = None,
+    ):
+        self.length = length
+        self.start_frame = start_frame
+        # (scene, line) of the config this was drawn for, see render_segments
+        self.segment = segment
+        # shake offsets come from Random(seed), or the global random if None
+        self.seed = seed
+        if lazy:
+            # do_video keeps mutating the objects after the scene is created,
+            # so keep a snapshot of their state for when the frames are drawn
+            self.arr = [copy.copy(obj) for obj in arr]
+            self.frames = None
+        else:
+            self.arr = arr
+            self.frames = list(self.render_frames())
+
+    def layer_frame(self, layer_idx: int, idx: int, text_idx: int):
+        if layer_idx == 0:
+            return 0
+        if isinstance(self.arr[layer_idx], AnimText):
+            return text_idx
+        return idx
+
+    def draw_layers(
+        self, background, start: int, stop: int, idx: int, text_idx: int
+    ):
+        for layer_idx in range(start, stop):
+            obj = self.arr[layer_idx]
+            if layer_idx == 0:
+                if isinstance(obj, AnimImg):
+                    background = obj.render()
+                else:
+                    background = obj.copy()
+            else:
+                frame = self.layer_frame(layer_idx, idx, text_idx)
+                obj.render(background, frame=frame)
+        return background
+
+    def blend_layers(
+        self,
+        buffer: np.ndarray,
+        start: int,
+        stop: int,
+        idx: int,
+        text_idx: int,
+        clip=None,
+    ):
+        region = (slice(None), slice(None))
+        if clip is not None:
+            region = rect_slices(clip)
+        for layer_idx in range(start, stop):
+            obj = self.arr[layer_idx]
+            if layer_idx == 0 and isinstance(obj, AnimImg):
+                buffer[region].fill(255)
+                obj.blend(buffer, clip=clip)
+            elif layer_idx == 0:
+                np.copyto(buffer[region], to_bgr(obj)[region])
+            else:
+                frame = self.layer_frame(layer_idx, idx, text_idx)
+                obj.blend(buffer, frame=frame, clip=clip)
+        return buffer
+
+    def cached_layers(self):
+        # the bottom of the stack up to the first layer that changes on every
+        # frame (typewriter text, shaking sprites) only depends on which frame
+        # each sprite shows, so it is composited once per distinct state
+        n_cached = 0
+        while n_cached < len(self.arr) and is_cacheable_layer(self.arr[n_cached]):
+            n_cached += 1
+        return n_cached
+
+    def cache_key(self, n_cached: int, idx: int, text_idx: int):
+        return tuple(
+            layer_state(obj, self.layer_frame(layer_idx, idx, text_idx))
+            for layer_idx, obj in enumerate(self.arr[:n_cached])
+        )
+
+    def frame_state(self, idx: int, text_idx: int):
+        # which frame every layer shows; two frames in a row with the same
+        # state are the same picture, unless something shakes
+        for obj in self.arr:
+            if isinstance(obj, AnimImg) and obj.shake_effect:
+                return None
+        return self.cache_key(len(self.arr), idx, text_idx)
+
+    def dirty_rect(self, size, previous, state):
+        # the pixels covered by a layer that changed since the previous frame,
+        # where it was and where it is now, or None if nothing changed
+        rect = None
+        for obj, old, new in zip(self.arr, previous, state):
+            if old == new:
+                continue
+            if isinstance(obj, AnimText):
+                obj.text_layer(size, new)
+                rect = union_rect(rect, obj.changed(size))
+            else:
+                rect = union_rect(rect, obj.extent(old))
+                rect = union_rect(rect, obj.extent(new))
+        if rect is None:
+            return None
+        x0, y0 = max(rect[0], 0), max(rect[1], 0)
+        x1, y1 = min(rect[2], size[0]), min(rect[3], size[1])
+        if x0 >= x1 or y0 >= y1:
+            return None
+        return (x0, y0, x1, y1)
+
+    def seed_layers(self):
+        rng = random.Random(self.seed) if self.seed is not None else None
+        for obj in self.arr:
+            if isinstance(obj, AnimImg):
+                obj.rng = rng
+
+    def render_frames(self):
+        self.seed_layers()
+        arr = self.arr
+        n_cached = self.cached_layers()
+        cached = {}
         text_idx = 0
+        previous = None
+        background = None
+        reused = 0
         #         print([str(x) for x in arr])
-        for idx in range(start_frame, length + start_frame):
-            if isinstance(arr[0], AnimImg):
-                background = arr[0].render()
+        for idx in range(self.start_frame, self.length + self.start_frame):
+            state = self.frame_state(idx, text_idx)
+            if background is not None and state is not None and state == previous:
+                # nothing moved, hand out the last frame again
+                reused += 1
+                yield background
+                text_idx += 1
+                continue
+            previous = state
+            if n_cached > 0:
+                key = self.cache_key(n_cached, idx, text_idx)
+                if key not in cached:
+                    cached[key] = self.draw_layers(None, 0, n_cached, idx, text_idx)
+                background = cached[key].copy()
             else:
-                background = arr[0]
-            for obj in arr[1:]:
-                if isinstance(obj, AnimText):
-                    obj.render(background, frame=text_idx)
-                else:
-                    obj.render(background, frame=idx)
-            self.frames.append(background)
+                background = self.draw_layers(None, 0, 1, idx, text_idx)
+            background = self.draw_layers(
+                background, max(n_cached, 1), len(arr), idx, text_idx
+            )
+            yield background
             text_idx += 1
+        metrics.count("frames_reused", reused)
+
+    def render_arrays(self, buffer: np.ndarray):
+        # same frames as render_frames, composited into a BGR buffer that is
+        # reused for every frame
+        if self.frames is not None:
+            for frame in self.frames:
+                np.copyto(buffer, to_bgr(frame))
+                yield buffer
+            return
+        # the buffer keeps the previous frame, so only the rectangle around
+        # the layers that changed since then is composited again
+        self.seed_layers()
+        n_cached = self.cached_layers()
+        cached = {}
+        text_idx = 0
+        size = (buffer.shape[1], buffer.shape[0])
+        full = (0, 0, *size)
+        previous = None
+        reused = 0
+        drawn = 0
+        for idx in range(self.start_frame, self.length + self.start_frame):
+            state = self.frame_state(idx, text_idx)
+            if previous is None or state is None:
+                clip = full
+            else:
+                clip = self.dirty_rect(size, previous, state)
+            previous = state
+            if clip is None:
+                reused += 1
+                yield buffer
+                text_idx += 1
+                continue
+            region = rect_slices(clip)
+            drawn += (clip[2] - clip[0]) * (clip[3] - clip[1])
+            if n_cached > 0:
+                key = self.cache_key(n_cached, idx, text_idx)
+                if key not in cached:
+                    cached[key] = to_bgr(
+                        self.draw_layers(None, 0, n_cached, idx, text_idx)
+                    )
+                np.copyto(buffer[region], cached[key][region])
+            else:
+                self.blend_layers(buffer, 0, 1, idx, text_idx, clip)
+            self.blend_layers(
+                buffer, max(n_cached, 1), len(self.arr), idx, text_idx, clip
+            )
+            yield buffer
+            text_idx += 1
+        metrics.count("frames_reused", reused)
+        metrics.count("pixels_composited", drawn)
+
+    @property
+    def size(self):
+        if self.frames is not None:
+            return self.frames[0].size
+        if isinstance(self.arr[0], AnimImg):
+            return self.arr[0].frames[0].size
+        return self.arr[0].size
+
+    def iter_frames(self):
+        if self.frames is not None:
+            return iter(self.frames)
+        return self.render_frames()
+
+
+class RenderContext:
+    # the randomness of one render, so the same thread and seed give the same
+    # video. Every scene's shake seed is drawn from it in order; character and
+    # emotion picks only depend on the author or comment they are for, so a
+    # thread overlapping another one makes the same picks for the comments
+    # they share and can reuse its cached segments
+    def __init__(self, seed: int = None):
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+        self.random = random.Random(seed)
+
+    def scene_seed(self):
+        return self.random.getrandbits(32)
+
+    def random_for(self, *key):
+        # str seeds are hashed with sha512, not hash(), so this is stable
+        # across processes
+        return random.Random("\n".join(str(part) for part in key))
+
+
+def comment_key(comment):
+    # praw comments have ids, the daemon's and the benchmarks' don't
+    comment_id = getattr(comment, "id", None)
+    if comment_id is not None:
+        return comment_id
+    return f"{comment.author.name}\n{comment.body}"
 
 
 class AnimVideo:
-    def __init__(self, scenes: List[AnimScene], fps: int = 10):
+    def __init__(
+        self, scenes: Iterable[AnimScene], fps: int = 10, engine: str = "pil"
+    ):
         self.scenes = scenes
         self.fps = fps
+        self.engine = engine
+
+    def iter_frames(self):
+        for scene in self.scenes:
+            yield from scene.iter_frames()
 
-    def render(self, output_path: str = None):
+    def iter_arrays(self):
+        if self.engine == "numpy":
+            buffer = None
+            for scene in self.scenes:
+                if buffer is None:
+                    _w, _h = scene.size
+                    buffer = np.empty((_h, _w, 3), dtype=np.uint8)
+                yield from scene.render_arrays(buffer)
+        elif self.engine == "pil":
+            previous = None
+            for frame in self.iter_frames():
+                # a scene hands out the same image again for a frame that
+                # didn't change
+                if frame is not previous:
+                    array = to_bgr(frame)
+                    previous = frame
+                yield array
+        else:
+            raise ValueError(f"unknown render engine {self.engine}")
+
+    def render(
+        self,
+        output_path: str = None,
+        workers: int = 1,
+        audio: AudioSegment = None,
+    ):
         if output_path is None:
             if not os.path.exists("tmp"):
                 os.makedirs("tmp")
             rnd_hash = random.getrandbits(64)
             output_path = f"tmp/{rnd_hash}.mp4"
-        fourcc = cv2.VideoWriter_fourcc(*"avc1")
-        background = self.scenes[0].frames[0]
-        if os.path.isfile(output_path):
-            os.remove(output_path)
-        video = cv2.VideoWriter(output_path, fourcc, self.fps, background.size)
-        for scene in self.scenes:
-            for frame in scene.frames:
-                video.write(cv2.cvtColor(np.array(frame), cv2.COLOR_RGB2BGR))
-        video.release()
+        if workers > 1 and can_fork:
+            return self.render_parallel(output_path, workers, audio=audio)
+        frames = self.iter_arrays()
+        background = next(frames)
+        _h, _w = background.shape[:2]
+        video = FFmpegWriter(output_path, (_w, _h), self.fps, audio=audio)
+        try:
+            for frame in itertools.chain([background], frames):
+                video.write(frame)
+        finally:
+            video.release()
+        return output_path
+
+    def render_parallel(
+        self, output_path: str, workers: int, audio: AudioSegment = None
+    ):
+        global _parallel_chunks
+        scenes = list(self.scenes)
+        # every scene gets its own shake seed, so the output is the same
+        # whichever chunk (and so whichever worker) ends up rendering it
+        for scene in scenes:
+            if scene.seed is None:
+                scene.seed = random.getrandbits(32)
+        _parallel_chunks = split_scenes(scenes, workers)
+        segment_paths = [
+            f"{output_path}.{idx}.mp4" for idx in range(len(_parallel_chunks))
+        ]
+        jobs = [
+            (idx, segment_path, self.fps, self.engine)
+            for idx, segment_path in enumerate(segment_paths)
+        ]
+        try:
+            for record in map_chunks(render_chunk, jobs, workers):
+                metrics.merge(record)
+        finally:
+            _parallel_chunks = None
+        try:
+            with metrics.span("concat"):
+                concat_videos(segment_paths, output_path, audio=audio)
+        finally:
+            for segment_path in segment_paths:
+                os.remove(segment_path)
         return output_path
 
 
+_parallel_chunks = None
+# the chunks reach the workers through the fork, which windows doesn't have;
+# there everything renders in this process
+can_fork = "fork" in multiprocessing.get_all_start_methods()
+
+
+def map_chunks(func, jobs: List, workers: int):
+    if workers <= 1 or len(jobs) <= 1 or not can_fork:
+        return [func(job) for job in jobs]
+    # forked workers inherit the scenes instead of having them pickled
+    context = multiprocessing.get_context("fork")
+    with context.Pool(min(workers, len(jobs))) as pool:
+        return pool.map(func, jobs)
+
+
+def render_chunk(job):
+    chunk_idx, output_path, fps, engine = job
+    scenes = _parallel_chunks[chunk_idx]
+    # counters from the forked worker go back with the result
+    with metrics.job(output_path, report=False) as record:
+        AnimVideo(scenes, fps=fps, engine=engine).render(output_path)
+    return record
+
+
+def split_scenes(scenes: List[AnimScene], n_chunks: int):
+    # contiguous chunks with roughly the same number of frames each
+    total = sum(scene.length for scene in scenes)
+    chunks = []
+    chunk = []
+    chunk_frames = 0
+    for scene in scenes:
+        chunk.append(scene)
+        chunk_frames += scene.length
+        if chunk_frames >= total / n_chunks and len(chunks) < n_chunks - 1:
+            chunks.append(chunk)
+            chunk = []
+            chunk_frames = 0
+    if len(chunk) > 0:
+        chunks.append(chunk)
+    return chunks
+
+
+class PCMPipe:
+    # feeds raw PCM to ffmpeg through a fifo, written from a thread so that
+    # ffmpeg can interleave it with the video frames coming in on stdin
+    def __init__(self, audio: AudioSegment):
+        audio = audio.set_sample_width(2)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "audio.pcm")
+        self.thread = None
+        if hasattr(os, "mkfifo"):
+            os.mkfifo(self.path)
+            self.thread = threading.Thread(
+                target=self.write, args=(audio.raw_data,), daemon=True
+            )
+            self.thread.start()
+        else:
+            self.write(audio.raw_data)
+        self.stream = ffmpeg.input(
+            self.path, format="s16le", ar=audio.frame_rate, ac=audio.channels
+        )
+
+    def write(self, data: bytes):
+        try:
+            with open(self.path, "wb") as pcm:
+                pcm.write(data)
+        except BrokenPipeError:
+            pass
+
+    def close(self):
+        if self.thread is not None and self.thread.is_alive():
+            # ffmpeg gave up before reading everything, unblock the writer
+            try:
+                os.close(os.open(self.path, os.O_RDONLY | os.O_NONBLOCK))
+            except OSError:
+                pass
+            self.thread.join()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+# keep ffmpeg's version strings out of the output, so a render can be compared
+# byte for byte
+bitexact = {"fflags": "+bitexact", "flags": "+bitexact"}
+
+
+class FFmpegWriter:
+    # same write/release interface as cv2.VideoWriter, but the frames are
+    # piped into a single ffmpeg process that also muxes in the audio
+    def __init__(
+        self, output_path: str, size, fps: int, audio: AudioSegment = None
+    ):
+        _w, _h = size
+        streams = [
+            ffmpeg.input(
+                "pipe:", format="rawvideo", pix_fmt="bgr24", s=f"{_w}x{_h}", r=fps
+            )
+        ]
+        kwargs = {"vcodec": "libx264", "pix_fmt": "yuv420p", **bitexact}
+        self.pcm = None
+        if audio is not None:
+            self.pcm = PCMPipe(audio)
+            streams.append(self.pcm.stream)
+            kwargs.update(acodec="aac", strict="experimental")
+        self.process = (
+            ffmpeg.output(*streams, output_path, **kwargs)
+            .overwrite_output()
+            .run_async(pipe_stdin=True)
+        )
+        self.frames = 0
+        self.nbytes = 0
+
+    def write(self, frame: np.ndarray):
+        self.process.stdin.write(frame.tobytes())
+        self.frames += 1
+        self.nbytes += frame.nbytes
+
+    def release(self):
+        # what ffmpeg still has to encode and mux after the last frame
+        with metrics.span("mux"):
+            try:
+                self.process.stdin.close()
+            except BrokenPipeError:
+                pass
+            self.process.wait()
+            if self.pcm is not None:
+                self.pcm.close()
+        metrics.count("frames_encoded", self.frames)
+        metrics.count("bytes_piped", self.nbytes)
+        if self.process.returncode != 0:
+            raise ffmpeg.Error("ffmpeg", None, None)
+
+
+def concat_videos(paths: List[str], output_path: str, audio: AudioSegment = None):
+    list_path = f"{output_path}.txt"
+    with open(list_path, "w") as list_file:
+        for path in paths:
+            list_file.write(f"file '{os.path.abspath(path)}'\n")
+    streams = [ffmpeg.input(list_path, format="concat", safe=0)]
+    kwargs = {"vcodec": "copy", **bitexact}
+    pcm = None
+    if audio is not None:
+        pcm = PCMPipe(audio)
+        streams.append(pcm.stream)
+        kwargs.update(acodec="aac", strict="experimental")
+    try:
+        ffmpeg.output(*streams, output_path, **kwargs).overwrite_output().run()
+    finally:
+        if pcm is not None:
+            pcm.close()
+        os.remove(list_path)
+
+
 def split_str_into_newlines(text: str, max_line_count: int = 34):
     words = text.split(" ")
     new_text = ""
@@ -272,10 +1006,16 @@ lag_frames = 25
 fps = 18
 
 
-def do_video(config: List[Dict]):
-    scenes = []
-    sound_effects = []
-    for scene in config:
+def iter_scenes(
+    config: List[Dict],
+    sound_effects: List[Dict],
+    lazy: bool = True,
+    context: RenderContext = None,
+):
+    def scene_seed():
+        return context.scene_seed() if context is not None else None
+
+    for scene_idx, scene in enumerate(config):
         bg = AnimImg(location_map[scene["location"]])
         arrow = AnimImg("assets/arrow.png", x=235, y=170, w=15, h=15, key_x=5)
         textbox = AnimImg("assets/textbox4.png", w=bg.w)
@@ -294,7 +1034,8 @@ def do_video(config: List[Dict]):
         current_character_name = None
         text = None
         #         print('scene', scene)
-        for obj in scene["scene"]:
+        for obj_idx, obj in enumerate(scene["scene"]):
+            segment = (scene_idx, obj_idx)
             if "character" in obj:
                 _dir = character_map[obj["character"]]
                 current_character_name = str(obj["character"])
@@ -395,8 +1136,13 @@ def do_video(config: List[Dict]):
                         [bg, character, bench, textbox, _character_name, text],
                     )
                 )
-                scenes.append(
-                    AnimScene(scene_objs, len(_text) - 1, start_frame=current_frame)
+                yield AnimScene(
+                    scene_objs,
+                    len(_text) - 1,
+                    start_frame=current_frame,
+                    lazy=lazy,
+                    segment=segment,
+                    seed=scene_seed(),
                 )
                 sound_effects.append({"_type": "bip", "length": len(_text) - 1})
                 if obj["action"] == Action.TEXT_SHAKE_EFFECT:
@@ -413,8 +1159,13 @@ def do_video(config: List[Dict]):
                         [bg, character, bench, textbox, _character_name, text, arrow],
                     )
                 )
-                scenes.append(
-                    AnimScene(scene_objs, lag_frames, start_frame=len(_text) - 1)
+                yield AnimScene(
+                    scene_objs,
+                    lag_frames,
+                    start_frame=len(_text) - 1,
+                    lazy=lazy,
+                    segment=segment,
+                    seed=scene_seed(),
                 )
                 current_frame += num_frames
                 sound_effects.append({"_type": "silence", "length": lag_frames})
@@ -443,8 +1194,13 @@ def do_video(config: List[Dict]):
                     )
                 else:
                     scene_objs = [bg, character, bench]
-                scenes.append(
-                    AnimScene(scene_objs, lag_frames, start_frame=current_frame)
+                yield AnimScene(
+                    scene_objs,
+                    lag_frames,
+                    start_frame=current_frame,
+                    lazy=lazy,
+                    segment=segment,
+                    seed=scene_seed(),
                 )
                 sound_effects.append({"_type": "shock", "length": lag_frames})
                 current_frame += lag_frames
@@ -463,7 +1219,14 @@ def do_video(config: List[Dict]):
                 scene_objs = list(
                     filter(lambda x: x is not None, [bg, character, bench, objection])
                 )
-                scenes.append(AnimScene(scene_objs, 11, start_frame=current_frame))
+                yield AnimScene(
+                    scene_objs,
+                    11,
+                    start_frame=current_frame,
+                    lazy=lazy,
+                    segment=segment,
+                    seed=scene_seed(),
+                )
                 bg.shake_effect = False
                 if bench is not None:
                     bench.shake_effect = False
@@ -471,7 +1234,14 @@ def do_video(config: List[Dict]):
                 scene_objs = list(
                     filter(lambda x: x is not None, [bg, character, bench])
                 )
-                scenes.append(AnimScene(scene_objs, 11, start_frame=current_frame))
+                yield AnimScene(
+                    scene_objs,
+                    11,
+                    start_frame=current_frame,
+                    lazy=lazy,
+                    segment=segment,
+                    seed=scene_seed(),
+                )
                 sound_effects.append(
                     {
                         "_type": "objection",
@@ -491,86 +1261,248 @@ def do_video(config: List[Dict]):
                     _length = obj["length"]
                 if "repeat" in obj:
                     character.repeat = obj["repeat"]
-                scenes.append(AnimScene(scene_objs, _length, start_frame=current_frame))
+                yield AnimScene(
+                    scene_objs,
+                    _length,
+                    start_frame=current_frame,
+                    lazy=lazy,
+                    segment=segment,
+                    seed=scene_seed(),
+                )
                 character.repeat = True
                 sound_effects.append({"_type": "silence", "length": _length})
                 current_frame += _length
-    video = AnimVideo(scenes, fps=fps)
-    video.render("test.mp4")
+
+
+def get_sound_effects(config: List[Dict]):
+    sound_effects = []
+    for _ in iter_scenes(config, sound_effects):
+        pass
     return sound_effects
 
 
-def do_audio(sound_effects: List[Dict]):
-    audio_se = AudioSegment.empty()
-    bip = AudioSegment.from_wav(
-        "assets/sfx general/sfx-blipmale.wav"
-    ) + AudioSegment.silent(duration=50)
-    blink = AudioSegment.from_wav("assets/sfx general/sfx-blink.wav")
-    blink -= 10
-    badum = AudioSegment.from_wav("assets/sfx general/sfx-fwashing.wav")
-    long_bip = bip * 100
-    long_bip -= 10
+def do_video(
+    config: List[Dict],
+    lazy: bool = True,
+    engine: str = "pil",
+    workers: int = 1,
+    output_path: str = "test.mp4",
+    context: RenderContext = None,
+):
+    sound_effects = []
+    scenes = iter_scenes(config, sound_effects, lazy=lazy, context=context)
+    if not lazy:
+        scenes = list(scenes)
+    video = AnimVideo(scenes, fps=fps, engine=engine)
+    video.render(output_path, workers=workers)
+    return sound_effects
+
+
+sample_rate = 44100
+audio_channels = 2
+
+objection_sounds = {
+    "phoenix": "assets/Phoenix - objection.mp3",
+    "edgeworth": "assets/Edgeworth - (English) objection.mp3",
+}
+default_objection_sound = "assets/Payne - Objection.mp3"
+
+
+def decode_clip(path: str, gain: float = 0):
+    clip = AudioSegment.from_file(path)
+    clip = clip.set_frame_rate(sample_rate).set_channels(audio_channels)
+    clip = clip.set_sample_width(2).apply_gain(gain)
+    return np.frombuffer(clip.raw_data, dtype=np.int16).reshape(-1, audio_channels)
+
+
+def apply_gain(samples: np.ndarray, gain: float):
+    # same rounding as AudioSegment.apply_gain
+    factor = 10 ** (gain / 20)
+    samples = np.floor(samples * factor)
+    return np.clip(samples, -32768, 32767).astype(np.int16)
+
+
+def load_clip(path: str, gain: float = 0):
+    # decoded once per process, resampled to the mixer's format
+    def load():
+        pack = asset_pack.default_pack()
+        if (
+            pack is not None
+            and path in pack.audio
+            and pack.index["sample_rate"] == sample_rate
+            and pack.index["channels"] == audio_channels
+        ):
+            samples = pack.samples(path)
+            return apply_gain(samples, gain) if gain else samples
+        return decode_clip(path, gain)
+
+    return asset_cache.get(("audio", path, gain), load)
+
+
+def load_long_bip():
+    def build():
+        bip = load_clip("assets/sfx general/sfx-blipmale.wav", gain=-10)
+        gap = np.zeros((ms_to_samples(50), audio_channels), dtype=np.int16)
+        return np.tile(np.concatenate([bip, gap]), (100, 1))
+
+    return asset_cache.get(("audio", "long_bip"), build)
+
+
+def ms_to_samples(ms: float):
+    return int(ms * sample_rate / 1000)
+
+
+def do_audio(sound_effects: List[Dict], output_path: str = None):
+    # every cue is written at its sample offset into one buffer sized from
+    # the timeline, instead of growing an AudioSegment one cue at a time
     spf = 1 / fps * 1000
-    pheonix_objection = AudioSegment.from_mp3("assets/Phoenix - objection.mp3")
-    edgeworth_objection = AudioSegment.from_mp3(
-        "assets/Edgeworth - (English) objection.mp3"
-    )
-    default_objection = AudioSegment.from_mp3("assets/Payne - Objection.mp3")
+    cues = []
+    music_cues = []
+    position = 0
     for obj in sound_effects:
-        if obj["_type"] == "silence":
-            audio_se += AudioSegment.silent(duration=int(obj["length"] * spf))
-        elif obj["_type"] == "bip":
-            audio_se += blink + long_bip[: max(int(obj["length"] * spf - len(blink)), 0)]
+        if obj["_type"] == "bg":
+            music_cues.append((position, load_clip(obj["src"])))
+            continue
+        length = ms_to_samples(int(obj["length"] * spf))
+        if obj["_type"] == "bip":
+            blink = load_clip("assets/sfx general/sfx-blink.wav", gain=-10)
+            cues.append((position, blink[:length]))
+            bip_start = position + len(blink)
+            bip_length = max(length - len(blink), 0)
+            cues.append((bip_start, load_long_bip()[:bip_length]))
         elif obj["_type"] == "objection":
-            if obj["character"] == "phoenix":
-                audio_se += pheonix_objection[: int(obj["length"] * spf)]
-            elif obj["character"] == "edgeworth":
-                audio_se += edgeworth_objection[: int(obj["length"] * spf)]
-            else:
-                audio_se += default_objection[: int(obj["length"] * spf)]
+            src = objection_sounds.get(obj["character"], default_objection_sound)
+            cues.append((position, load_clip(src)[:length]))
         elif obj["_type"] == "shock":
-            audio_se += badum[: int(obj["length"] * spf)]
-    #     audio_se -= 10
-    music_tracks = []
-    len_counter = 0
-    for obj in sound_effects:
-        if obj["_type"] == "bg":
-            if len(music_tracks) > 0:
-                music_tracks[-1]["length"] = len_counter
-                len_counter = 0
-            music_tracks.append({"src": obj["src"]})
-        else:
-            len_counter += obj["length"]
-    if len(music_tracks) > 0:
-        music_tracks[-1]["length"] = len_counter
-    #     print(music_tracks)
-    music_se = AudioSegment.empty()
-    for track in music_tracks:
-        music_se += AudioSegment.from_mp3(track["src"])[
-            : int((track["length"] / fps) * 1000)
-        ]
-    #     music_se = AudioSegment.from_mp3(sound_effects[0]["src"])[:len(audio_se)]
-    #     music_se -= 5
-    final_se = music_se.overlay(audio_se)
-    final_se.export("final_se.mp3", format="mp3")
-
-
-def ace_attorney_anim(config: List[Dict], output_filename: str = "output.mp4"):
-    sound_effects = do_video(config)
-    do_audio(sound_effects)
-    video = ffmpeg.input("test.mp4")
-    audio = ffmpeg.input("final_se.mp3")
-    if os.path.exists(output_filename):
-        os.remove(output_filename)
-    out = ffmpeg.output(
-        video,
-        audio,
-        output_filename,
-        vcodec="copy",
-        acodec="aac",
-        strict="experimental",
+            badum = load_clip("assets/sfx general/sfx-fwashing.wav")
+            cues.append((position, badum[:length]))
+        position += length
+    mix = np.zeros((position, audio_channels), dtype=np.int32)
+    # each music track plays until the next one starts
+    music_ends = [start for start, _ in music_cues[1:]] + [position]
+    for (start, track), end in zip(music_cues, music_ends):
+        cues.append((start, track[: end - start]))
+    for start, samples in cues:
+        samples = samples[: max(len(mix) - start, 0)]
+        mix[start : start + len(samples)] += samples
+    final_se = AudioSegment(
+        data=np.clip(mix, -32768, 32767).astype(np.int16).tobytes(),
+        sample_width=2,
+        frame_rate=sample_rate,
+        channels=audio_channels,
+    )
+    if output_path is not None:
+        final_se.export(output_path, format="mp3")
+    return final_se
+
+
+def segment_key(config: List[Dict], scene_idx: int, obj_idx: int):
+    # a line is drawn from its scene's location and the lines before it in
+    # the same scene, which overlapping threads share whole
+    scene = config[scene_idx]
+    objs = scene["scene"]
+    if "character" not in objs[0]:
+        # carries its sprites over from the scene before
+        return None
+    return render_cache.config_key(
+        {"location": scene["location"], "scene": objs[: obj_idx + 1]},
+        fps=fps,
+        lag_frames=lag_frames,
     )
-    out.run()
+
+
+def render_segments(
+    config: List[Dict],
+    output_path: str,
+    cache: render_cache.RenderCache,
+    engine: str = "pil",
+    workers: int = 1,
+    audio: AudioSegment = None,
+    context: RenderContext = None,
+):
+    # every line is encoded on its own and cached, then the video is put
+    # together by copying the streams; only lines not seen before get drawn
+    global _parallel_chunks
+    scenes = iter_scenes(config, [], context=context)
+    paths = []
+    misses = []
+    for idx, (segment, segment_scenes) in enumerate(
+        itertools.groupby(scenes, key=lambda scene: scene.segment)
+    ):
+        segment_scenes = list(segment_scenes)
+        key = segment_key(config, *segment)
+        path = f"{output_path}.{idx}.mp4"
+        paths.append(path)
+        if key is not None and cache.lookup(key) is not None:
+            if cache.fetch(key, path):
+                continue
+        # shakes are seeded from the content, so a line looks the same in
+        # every video it ends up in
+        for scene in segment_scenes:
+            if key is not None:
+                scene.seed = int(key[:8], 16)
+            elif scene.seed is None:
+                scene.seed = random.getrandbits(32)
+        misses.append((key, path, segment_scenes))
+    _parallel_chunks = [segment_scenes for _, _, segment_scenes in misses]
+    jobs = [(idx, path, fps, engine) for idx, (_, path, _) in enumerate(misses)]
+    try:
+        with metrics.span("draw"):
+            records = map_chunks(render_chunk, jobs, workers)
+        for record in records:
+            metrics.merge(record)
+    finally:
+        _parallel_chunks = None
+    try:
+        for key, path, _ in misses:
+            if key is not None:
+                cache.put(key, path)
+        with metrics.span("concat"):
+            concat_videos(paths, output_path, audio=audio)
+    finally:
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+    return output_path
+
+
+def ace_attorney_anim(
+    config: List[Dict],
+    output_filename: str = "output.mp4",
+    engine: str = "pil",
+    workers: int = 1,
+    segment_cache: render_cache.RenderCache = None,
+    context: RenderContext = None,
+):
+    # the audio has to be ready before the frames start streaming into
+    # ffmpeg, so get the timeline first and build the scenes again to render
+    with metrics.span("audio"):
+        audio = do_audio(get_sound_effects(config))
+    # render into a private directory next to the output, so concurrent jobs
+    # never share files and the finished video is moved into place atomically
+    output_dir = os.path.dirname(os.path.abspath(output_filename))
+    job_dir = tempfile.mkdtemp(dir=output_dir)
+    try:
+        output_path = os.path.join(job_dir, "output.mp4")
+        with metrics.span("video"):
+            if segment_cache is not None:
+                render_segments(
+                    config,
+                    output_path,
+                    segment_cache,
+                    engine,
+                    workers,
+                    audio=audio,
+                    context=context,
+                )
+            else:
+                scenes = iter_scenes(config, [], context=context)
+                video = AnimVideo(scenes, fps=fps, engine=engine)
+                video.render(output_path, workers=workers, audio=audio)
+        metrics.count("video_bytes", os.path.getsize(output_path))
+        os.replace(output_path, output_filename)
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
 
 
 character_location_map = {
@@ -664,7 +1596,14 @@ character_emotions = {
 }
 
 
-def get_characters(most_common: List):
+def most_common_authors(comments: List) -> List[str]:
+    # ties go by name rather than by who commented first, so a thread with
+    # its top comment dropped still casts its authors the same way
+    counts = Counter(comment.author.name for comment in comments)
+    return sorted(counts, key=lambda name: (-counts[name], name))
+
+
+def get_characters(most_common: List, context: RenderContext = None):
     characters = {Character.PHOENIX: most_common[0]}
     if len(most_common) > 0:
         characters[Character.EDGEWORTH] = most_common[1]
@@ -684,7 +1623,8 @@ def get_characters(most_common: List):
                 Character.GUMSHOE,
                 Character.GROSSBERG,
             ]
-            rnd_character = random.choice(
+            rng = context.random_for(character) if context is not None else random
+            rnd_character = rng.choice(
                 list(
                     filter(
                         lambda character: character not in characters, rnd_characters
@@ -695,20 +1635,55 @@ def get_characters(most_common: List):
     return characters
 
 
-def comments_to_scene(comments: List, characters: Dict, **kwargs):
+class CommentText(NamedTuple):
+    sentences: List[str]
+    language: str
+    polarity: float
+
+
+def preprocess_comments(
+    comments: List,
+    batch_size: int = 64,
+    sentencizer: bool = False,
+    analyzer: sentiment.SentimentAnalyzer = None,
+) -> List[CommentText]:
+    # all comments go through spaCy in batches, which can span several
+    # threads when the caller passes them in together
+    if analyzer is None:
+        analyzer = sentiment.default_analyzer()
+    with metrics.span("spacy"):
+        nlp = get_nlp(sentencizer)
+        docs = list(
+            nlp.pipe((comment.body for comment in comments), batch_size=batch_size)
+        )
+    processed = []
+    with metrics.span("sentiment"):
+        for comment, doc in zip(comments, docs):
+            language, polarity = analyzer.analyze(comment.body)
+            processed.append(
+                CommentText(
+                    sentences=[sent.string.strip() for sent in doc.sents],
+                    language=language,
+                    polarity=polarity,
+                )
+            )
+    return processed
+
+
+def comments_to_config(
+    comments: List,
+    characters: Dict,
+    processed: List[CommentText] = None,
+    sentencizer: bool = False,
+    context: RenderContext = None,
+):
     scene = []
     inv_characters = {v: k for k, v in characters.items()}
-    for comment in comments:
-        blob = TextBlob(comment.body)
-        try:
-            if (len(comment.body) >= 3 and blob.detect_language() != 'en'):
-                    polarity = blob.translate(to='en').sentiment.polarity
-            else:
-                polarity = blob.sentiment.polarity
-        except:
-            polarity = blob.sentiment.polarity
-        tokens = nlp(comment.body)
-        sentences = [sent.string.strip() for sent in tokens.sents]
+    if processed is None:
+        processed = preprocess_comments(comments, sentencizer=sentencizer)
+    for comment, comment_text in zip(comments, processed):
+        polarity = comment_text.polarity
+        sentences = comment_text.sentences
         joined_sentences = []
         i = 0
         while i < len(sentences):
@@ -726,11 +1701,15 @@ def comments_to_scene(comments: List, characters: Dict, **kwargs):
                     i += 1
         character_block = []
         character = inv_characters[comment.author.name]
-        main_emotion = random.choice(character_emotions[character]["neutral"])
+        if context is not None:
+            rng = context.random_for(comment_key(comment))
+        else:
+            rng = random
+        main_emotion = rng.choice(character_emotions[character]["neutral"])
         if polarity < 0 or comment.score < 0:
-            main_emotion = random.choice(character_emotions[character]["sad"])
+            main_emotion = rng.choice(character_emotions[character]["sad"])
         elif polarity > 0:
-            main_emotion = random.choice(character_emotions[character]["happy"])
+            main_emotion = rng.choice(character_emotions[character]["happy"])
         for idx, chunk in enumerate(joined_sentences):
             character_block.append(
                 {
@@ -780,4 +1759,18 @@ def comments_to_scene(comments: List, characters: Dict, **kwargs):
             formatted_scene["audio"] = last_audio
             change_audio = False
         formatted_scenes.append(formatted_scene)
-    ace_attorney_anim(formatted_scenes, **kwargs)
+    return formatted_scenes
+
+
+def comments_to_scene(
+    comments: List,
+    characters: Dict,
+    processed: List[CommentText] = None,
+    sentencizer: bool = False,
+    context: RenderContext = None,
+    **kwargs,
+):
+    config = comments_to_config(
+        comments, characters, processed, sentencizer, context=context
+    )
+    ace_attorney_anim(config, context=context, **kwargs)
@@ -0,0 +1,149 @@
+import glob
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+from PIL import Image
+
+MAGIC = b"AAPACK01"
+HEADER = struct.Struct("<8sQQ")
+ALIGN = 64
+
+default_path = os.environ.get("asset_pack", "assets/assets.pack")
+
+
+class AssetPack:
+    # raw RGBA sprite frames and PCM audio, memory mapped so every process
+    # reading the pack shares the same pages of the OS page cache
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as pack_file:
+            self.mm = mmap.mmap(pack_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_offset, index_length = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an asset pack")
+        self.index = json.loads(self.mm[index_offset : index_offset + index_length])
+        self.version = self.index["version"]
+        self.images = self.index["images"]
+        self.audio = self.index["audio"]
+
+    def __contains__(self, path: str):
+        return path in self.images or path in self.audio
+
+    def image(self, path: str):
+        entry = self.images[path]
+        frames = []
+        for offset, w, h, nearest in entry["frames"]:
+            data = np.frombuffer(
+                self.mm, dtype=np.uint8, count=w * h * 4, offset=offset
+            )
+            frame = Image.frombuffer("RGBA", (w, h), data, "raw", "RGBA", 0, 1)
+            frames.append((frame, Image.NEAREST if nearest else None))
+        return frames, entry["animated"]
+
+    def samples(self, path: str):
+        entry = self.audio[path]
+        channels = self.index["channels"]
+        count = entry["samples"] * channels
+        data = np.frombuffer(
+            self.mm, dtype=np.int16, count=count, offset=entry["offset"]
+        )
+        return data.reshape(-1, channels)
+
+
+_default_pack = None
+
+
+def default_pack():
+    global _default_pack
+    if _default_pack is None and os.path.isfile(default_path):
+        _default_pack = AssetPack(default_path)
+    return _default_pack
+
+
+def image_paths():
+    import anim
+
+    paths = list(anim.location_map.values())
+    for _dir in anim.character_map.values():
+        paths += sorted(glob.glob(f"{_dir}/*.gif"))
+    paths += [
+        "assets/arrow.png",
+        "assets/textbox4.png",
+        "assets/objection.gif",
+        "assets/logo-left.png",
+        "assets/logo-right.png",
+        "assets/witness_stand.png",
+    ]
+    return paths
+
+
+def audio_paths():
+    import anim
+
+    paths = [
+        "assets/sfx general/sfx-blipmale.wav",
+        "assets/sfx general/sfx-blink.wav",
+        "assets/sfx general/sfx-fwashing.wav",
+        *anim.objection_sounds.values(),
+        anim.default_objection_sound,
+    ]
+    paths += sorted(path for path in glob.glob("assets/*.mp3") if path not in paths)
+    return paths
+
+
+def build(output_path: str = default_path):
+    import anim
+
+    index = {
+        "sample_rate": anim.sample_rate,
+        "channels": anim.audio_channels,
+        "images": {},
+        "audio": {},
+    }
+    digest = hashlib.sha1()
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as pack_file:
+        pack_file.write(HEADER.pack(MAGIC, 0, 0))
+
+        def write_blob(data: bytes):
+            pack_file.write(b"\0" * (-pack_file.tell() % ALIGN))
+            offset = pack_file.tell()
+            pack_file.write(data)
+            digest.update(data)
+            return offset
+
+        for path in image_paths():
+            frames = []
+            with Image.open(path, "r") as img:
+                animated = img.format == "GIF" and img.is_animated
+                for idx in range(img.n_frames if animated else 1):
+                    img.seek(idx)
+                    # P and 1 images are always resized with NEAREST
+                    nearest = img.mode in ("1", "P")
+                    frame = img.convert("RGBA")
+                    offset = write_blob(frame.tobytes())
+                    frames.append([offset, frame.size[0], frame.size[1], nearest])
+            index["images"][path] = {"animated": animated, "frames": frames}
+            print(f"packed {path} ({len(frames)} frames)")
+        for path in audio_paths():
+            samples = anim.decode_clip(path)
+            offset = write_blob(samples.tobytes())
+            index["audio"][path] = {"offset": offset, "samples": len(samples)}
+            print(f"packed {path} ({len(samples)} samples)")
+        index["version"] = digest.hexdigest()
+        index_data = json.dumps(index).encode("utf-8")
+        index_offset = pack_file.tell()
+        pack_file.write(index_data)
+        pack_file.seek(0)
+        pack_file.write(HEADER.pack(MAGIC, index_offset, len(index_data)))
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+if __name__ == "__main__":
+    build(*sys.argv[1:])
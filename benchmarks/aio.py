@@ -0,0 +1,144 @@
+# Jobs per minute through worker.Worker against a local aiohttp stand-in for
+# reddit and streamable with made up latencies, the render replaced by a
+# CPU-bound stand-in of fixed length. Compares one job at a time (what the
+# bots used to do) with several in flight over the pooled session.
+#
+#   python -m benchmarks.aio --jobs 24 --render 0.5 --workers 2
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from aiohttp import web
+
+import aioreddit
+import jobstore
+import uploads
+import worker
+
+
+def fake_render(comments, output_filename: str):
+    end = time.process_time() + fake_render.seconds
+    while time.process_time() < end:
+        pass
+    with open(output_filename, "wb") as f:
+        f.write(os.urandom(1024 * 1024))
+    return None, None, None
+
+
+fake_render.seconds = 0.5
+
+
+def comment_data(comment_id: str, parent_id: str):
+    return {
+        "id": comment_id,
+        "name": f"t1_{comment_id}",
+        "parent_id": parent_id,
+        "body": f"comment {comment_id}",
+        "score": 1,
+        "author": f"user{len(comment_id) % 5}",
+        "permalink": f"/r/test/comments/x/y/{comment_id}/",
+    }
+
+
+def stand_in(depth: int, latency: float, upload_latency: float):
+    # every job id j<n> is the bottom of its own chain d<n>_<depth-1> .. d<n>_0
+    stats = {"info": 0, "reply": 0, "upload": 0}
+
+    def lookup(fullname: str):
+        comment_id = fullname[3:]
+        if comment_id.startswith("j"):
+            return comment_data(comment_id, f"t1_d{comment_id[1:]}_{depth - 1}")
+        thread, level = comment_id[1:].split("_")
+        level = int(level)
+        parent = f"t1_d{thread}_{level - 1}" if level > 0 else "t3_post"
+        return comment_data(comment_id, parent)
+
+    async def token(request):
+        return web.json_response({"access_token": "token", "expires_in": 3600})
+
+    async def info(request):
+        stats["info"] += 1
+        await asyncio.sleep(latency)
+        children = [
+            {"kind": "t1", "data": lookup(fullname)}
+            for fullname in request.query["id"].split(",")
+        ]
+        return web.json_response({"data": {"children": children}})
+
+    async def reply(request):
+        stats["reply"] += 1
+        await request.post()
+        await asyncio.sleep(latency)
+        return web.json_response({"json": {"errors": []}})
+
+    async def upload(request):
+        stats["upload"] += 1
+        await request.read()
+        await asyncio.sleep(upload_latency)
+        return web.json_response({"shortcode": "abcdef"})
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/api/v1/access_token", token)
+    app.router.add_get("/api/info", info)
+    app.router.add_post("/api/comment", reply)
+    app.router.add_post("/upload", upload)
+    return app, stats
+
+
+async def serve_stand_in(app):
+    # on a free port, with the reddit and streamable clients pointed at it
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    aioreddit.reddit_api_url = f"http://127.0.0.1:{port}"
+    aioreddit.reddit_auth_url = f"http://127.0.0.1:{port}/api/v1/access_token"
+    uploads.streamable_api_url = f"http://127.0.0.1:{port}"
+    return runner
+
+
+async def run(args, in_flight: int, tmp_dir: str):
+    app, stats = stand_in(args.depth, args.latency, args.upload_latency)
+    runner = await serve_stand_in(app)
+
+    jobs = jobstore.JobStore(os.path.join(tmp_dir, f"jobs{in_flight}.db"))
+    for idx in range(args.jobs):
+        jobs.add(f"j{idx}", source="mentions")
+    bench = worker.Worker(jobs, args.workers, in_flight, render=fake_render)
+    start = time.perf_counter()
+    await bench.serve(drain=True)
+    elapsed = time.perf_counter() - start
+    await runner.cleanup()
+    assert bench.done == args.jobs, jobs.counts()
+    assert stats["reply"] == stats["upload"] == args.jobs
+    return args.jobs / elapsed * 60, stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=24)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--depth", type=int, default=8)
+    parser.add_argument("--render", type=float, default=0.5, help="cpu s/job")
+    parser.add_argument("--latency", type=float, default=0.1, help="s/request")
+    parser.add_argument("--upload-latency", type=float, default=1.0)
+    args = parser.parse_args()
+    fake_render.seconds = args.render
+    worker.poll_interval = 0.05
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            print(f"{'in flight':>10} {'jobs/min':>9} {'info calls':>11}")
+            for in_flight in (1, args.workers * 2):
+                rate, stats = asyncio.run(run(args, in_flight, tmp_dir))
+                print(f"{in_flight:10d} {rate:9.1f} {stats['info']:11d}")
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Audio build time against the number of cues, for the old AudioSegment
+# concatenation and the preallocated NumPy mixer.
+#
+#   python -m benchmarks.audio --cues 50 200 800
+import argparse
+import random
+import time
+from typing import List, Dict
+
+from pydub import AudioSegment
+
+import anim
+
+
+def legacy_do_audio(sound_effects: List[Dict]):
+    audio_se = AudioSegment.empty()
+    bip = AudioSegment.from_wav(
+        "assets/sfx general/sfx-blipmale.wav"
+    ) + AudioSegment.silent(duration=50)
+    blink = AudioSegment.from_wav("assets/sfx general/sfx-blink.wav")
+    blink -= 10
+    long_bip = bip * 100
+    long_bip -= 10
+    spf = 1 / anim.fps * 1000
+    for obj in sound_effects:
+        if obj["_type"] == "silence":
+            audio_se += AudioSegment.silent(duration=int(obj["length"] * spf))
+        elif obj["_type"] == "bip":
+            length = max(int(obj["length"] * spf - len(blink)), 0)
+            audio_se += blink + long_bip[:length]
+    music_se = AudioSegment.from_mp3(sound_effects[0]["src"])[: len(audio_se)]
+    return music_se.overlay(audio_se)
+
+
+def synthetic_sound_effects(n_cues: int, seed: int = 0):
+    rnd = random.Random(seed)
+    music = "assets/03 - Turnabout Courtroom - Trial.mp3"
+    sound_effects = [{"_type": "bg", "src": music}]
+    for idx in range(n_cues):
+        if idx % 2 == 0:
+            sound_effects.append({"_type": "bip", "length": rnd.randint(20, 80)})
+        else:
+            sound_effects.append({"_type": "silence", "length": anim.lag_frames})
+    return sound_effects
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cues", type=int, nargs="+", default=[50, 200, 800])
+    args = parser.parse_args()
+    # decode the clips once up front, the mixer keeps them cached
+    anim.do_audio(synthetic_sound_effects(2))
+    for n_cues in args.cues:
+        sound_effects = synthetic_sound_effects(n_cues)
+        start = time.perf_counter()
+        legacy_do_audio(sound_effects)
+        legacy = time.perf_counter() - start
+        start = time.perf_counter()
+        anim.do_audio(sound_effects)
+        mixer = time.perf_counter() - start
+        print(f"{n_cues:>5} cues  legacy {legacy:8.3f}s  mixer {mixer:8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
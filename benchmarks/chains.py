@@ -0,0 +1,123 @@
+# Reddit requests and simulated latency to resolve comment chains, walking
+# parent() one comment at a time as the bots used to versus the worker's
+# AsyncReddit.get_chain, batching through /api/info with a shared cache. The
+# reddit client is a stub, so this runs offline.
+#
+#   python -m benchmarks.chains --jobs 20 --depth 40 --latency 0.05
+import argparse
+import asyncio
+import random
+
+import aioreddit
+
+
+class StubComment:
+    def __init__(self, reddit, comment_id: str, parent_id: str):
+        self.reddit = reddit
+        self.id = comment_id
+        self.fullname = f"t1_{comment_id}"
+        self.parent_id = parent_id
+
+    def parent(self):
+        # every lazy parent fetch is a request
+        return self.reddit.fetch_one(self.parent_id)
+
+
+class StubReddit:
+    def __init__(self, comments, latency: float):
+        self.comments = comments
+        self.latency = latency
+        self.requests = 0
+
+    def fetch_one(self, fullname: str):
+        self.requests += 1
+        return self.comments.get(fullname)
+
+    def info(self, fullnames):
+        assert len(fullnames) <= 100
+        self.requests += 1
+        return [self.comments[name] for name in fullnames if name in self.comments]
+
+    @property
+    def elapsed(self):
+        return self.requests * self.latency
+
+
+class StubAsyncReddit(aioreddit.AsyncReddit):
+    # the worker's client with /api/info answered by the stub
+    def __init__(self, reddit: StubReddit):
+        super().__init__(None, None, None, None)
+        self.stub = reddit
+
+    async def info(self, fullnames):
+        return self.stub.info(fullnames)
+
+
+def get_chains(reddit: StubReddit, summons):
+    # one job at a time, as the worker calls it
+    client = StubAsyncReddit(reddit)
+
+    async def run():
+        return [await client.get_chain(comment) for comment in summons]
+
+    return asyncio.run(run()), client.chain_resolver
+
+
+def synthetic_tree(reddit, n_jobs: int, depth: int, seed: int = 0):
+    # a few long trunks that jobs branch off from, like several summons
+    # on the same busy thread
+    rnd = random.Random(seed)
+    comments = reddit.comments
+    trunks = []
+    for trunk in range(4):
+        parent_id = f"t3_post{trunk}"
+        chain = []
+        for level in range(depth):
+            comment = StubComment(reddit, f"c{trunk}_{level}", parent_id)
+            comments[comment.fullname] = comment
+            chain.append(comment)
+            parent_id = comment.fullname
+        trunks.append(chain)
+    summons = []
+    for job in range(n_jobs):
+        parent = rnd.choice(rnd.choice(trunks))
+        comment = StubComment(reddit, f"summon{job}", parent.fullname)
+        comments[comment.fullname] = comment
+        summons.append(comment)
+    return summons
+
+
+def legacy_chain(comment):
+    chain = [comment]
+    while comment.parent_id.startswith("t1_"):
+        comment = comment.parent()
+        chain.append(comment)
+    return chain
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--depth", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.05, help="s/request")
+    args = parser.parse_args()
+
+    legacy_reddit = StubReddit({}, args.latency)
+    summons = synthetic_tree(legacy_reddit, args.jobs, args.depth)
+    legacy = [legacy_chain(comment) for comment in summons]
+
+    reddit = StubReddit({}, args.latency)
+    summons = synthetic_tree(reddit, args.jobs, args.depth)
+    chains, resolver = get_chains(reddit, summons)
+    assert [[c.fullname for c in chain] for chain in chains] == [
+        [c.fullname for c in chain] for chain in legacy
+    ]
+
+    print(f"{'':12} {'requests':>9} {'latency':>9}")
+    for name, stub in [("legacy", legacy_reddit), ("resolver", reddit)]:
+        print(f"{name:12} {stub.requests:9d} {stub.elapsed:8.2f}s")
+    print(f"cache hits {resolver.hits}, misses {resolver.misses}")
+
+
+if __name__ == "__main__":
+    main()
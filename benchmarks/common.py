@@ -0,0 +1,56 @@
+import random
+from typing import List, Dict
+
+import anim
+
+sample_words = (
+    "objection the witness is clearly lying about what happened that night "
+    "and i can prove it with this evidence hold it your honour"
+).split(" ")
+
+
+class Author:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class Comment:
+    # the fields anim reads from a praw comment
+    def __init__(self, author: str, body: str, score: int = 0):
+        self.author = Author(author)
+        self.body = body
+        self.score = score
+
+
+def synthetic_text(rnd: random.Random, min_words: int = 4, max_words: int = 20):
+    return " ".join(
+        rnd.choice(sample_words) for _ in range(rnd.randint(min_words, max_words))
+    )
+
+
+def synthetic_config(n_comments: int, seed: int = 0) -> List[Dict]:
+    rnd = random.Random(seed)
+    characters = [anim.Character.PHOENIX, anim.Character.EDGEWORTH]
+    config = []
+    for idx in range(n_comments):
+        character = characters[idx % len(characters)]
+        scene_objs = []
+        if rnd.random() < 0.2:
+            scene_objs.append({"character": character, "action": anim.Action.OBJECTION})
+        scene_objs.append(
+            {
+                "character": character,
+                "action": anim.Action.TEXT,
+                "emotion": "normal",
+                "text": synthetic_text(rnd),
+                "name": f"user{idx % 5}",
+            }
+        )
+        formatted_scene = {
+            "location": anim.character_location_map[character],
+            "scene": scene_objs,
+        }
+        if idx == 0:
+            formatted_scene["audio"] = "03 - Turnabout Courtroom - Trial"
+        config.append(formatted_scene)
+    return config
@@ -0,0 +1,117 @@
+# Latency of a render through render_daemon.py against starting a fresh
+# process per video (importing anim and loading the assets each time), for
+# configs the caches have not seen.
+#
+#   python -m benchmarks.daemon --renders 4 --comments 3
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+from benchmarks.common import synthetic_config
+
+
+def render_cold(seed: int, comments: int, output_path: str):
+    import anim
+
+    config = synthetic_config(comments, seed=seed)
+    anim.ace_attorney_anim(config, output_filename=output_path)
+
+
+async def render_warm(socket_path: str, configs, tmp_dir: str):
+    times = []
+    connector = aiohttp.UnixConnector(path=socket_path)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        while True:
+            try:
+                async with session.get("http://daemon/status") as response:
+                    if response.status == 200:
+                        break
+            except aiohttp.ClientConnectionError:
+                await asyncio.sleep(0.2)
+        for idx, config in enumerate(configs):
+            output = os.path.join(tmp_dir, f"warm{idx}.mp4")
+            start = time.perf_counter()
+            async with session.post(
+                "http://daemon/render", json={"config": config, "output": output}
+            ) as response:
+                assert response.status == 200, await response.text()
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--renders", type=int, default=4)
+    parser.add_argument("--comments", type=int, default=3)
+    parser.add_argument("--cold", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.cold is not None:
+        render_cold(args.cold, args.comments, args.output)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = dict(
+            os.environ,
+            render_cache=os.path.join(tmp_dir, "render_cache"),
+            render_daemon_socket=os.path.join(tmp_dir, "daemon.sock"),
+            render_daemon_output_dir=tmp_dir,
+            metrics_log=os.path.join(tmp_dir, "jobs.jsonl"),
+        )
+        cold = []
+        for seed in range(args.renders):
+            start = time.perf_counter()
+            subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.daemon",
+                    "--comments",
+                    str(args.comments),
+                    "--cold",
+                    str(seed),
+                    "--output",
+                    os.path.join(tmp_dir, f"cold{seed}.mp4"),
+                ],
+                env=env,
+                check=True,
+                capture_output=True,
+            )
+            cold.append(time.perf_counter() - start)
+
+        daemon_path = os.path.join(os.path.dirname(__file__), "..", "render_daemon.py")
+        daemon = subprocess.Popen(
+            [sys.executable, daemon_path, "1"],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            start = time.perf_counter()
+            configs = [
+                json.loads(json.dumps(synthetic_config(args.comments, seed=seed)))
+                for seed in range(args.renders, args.renders * 2)
+            ]
+            warm = asyncio.run(
+                render_warm(env["render_daemon_socket"], configs, tmp_dir)
+            )
+            startup = time.perf_counter() - start - sum(warm)
+        finally:
+            daemon.terminate()
+            daemon.wait()
+
+    print(f"fresh process per render  {sum(cold) / len(cold):6.2f}s")
+    print(f"daemon startup            {startup:6.2f}s")
+    print(f"daemon, first render      {warm[0]:6.2f}s")
+    print(f"daemon, warm renders      {sum(warm[1:]) / max(len(warm) - 1, 1):6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Throughput of the PIL and NumPy compositing engines, how many frames were
+# handed out again unchanged and how much of each frame NumPy composited
+# (only the dirty rectangle), and a pixel diff between the frames they
+# produce for the same thread.
+#
+#   python -m benchmarks.engines --comments 10
+import argparse
+import random
+import time
+
+import numpy as np
+
+import anim
+import metrics
+from benchmarks.common import synthetic_config
+
+
+def render(config, engine: str, seed: int = 0):
+    random.seed(seed)
+    sound_effects = []
+    scenes = anim.iter_scenes(config, sound_effects)
+    video = anim.AnimVideo(scenes, fps=anim.fps, engine=engine)
+    frames = []
+    start = time.perf_counter()
+    with metrics.job(engine, report=False) as record:
+        for frame in video.iter_arrays():
+            frames.append(frame.copy())
+    return frames, time.perf_counter() - start, record["counters"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--comments", type=int, default=10)
+    args = parser.parse_args()
+    config = synthetic_config(args.comments)
+    # make sure the shaking layers are covered by the diff too
+    config[0]["scene"].append({"action": anim.Action.SHAKE_EFFECT})
+    results = {}
+    for engine in ("pil", "numpy"):
+        frames, elapsed, counters = render(config, engine)
+        results[engine] = frames
+        line = f"{engine:<6} {len(frames) / elapsed:8.1f} frames/s"
+        line += f", {counters.get('frames_reused', 0)} frames reused"
+        if "pixels_composited" in counters:
+            share = counters["pixels_composited"] / frames[0][..., 0].size
+            line += f", {share / len(frames):.0%} of each frame composited"
+        print(line)
+    max_diff = max(
+        int(np.abs(a.astype(np.int16) - b.astype(np.int16)).max())
+        for a, b in zip(results["pil"], results["numpy"])
+    )
+    print(f"max pixel diff {max_diff}")
+    assert len(results["pil"]) == len(results["numpy"])
+    # the engines have to agree exactly, dirty rectangles and reused frames
+    # included
+    assert max_diff == 0, "PIL and NumPy frames differ"
+
+
+if __name__ == "__main__":
+    main()
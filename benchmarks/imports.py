@@ -0,0 +1,50 @@
+# Import time of a module, from the output of python -X importtime.
+#
+#   python -m benchmarks.imports --module anim --top 15
+import argparse
+import json
+import subprocess
+import sys
+
+
+def import_times(module: str):
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+    times = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        times.append(
+            {
+                "module": name.strip(),
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+            }
+        )
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="anim")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    times = import_times(args.module)
+    total = next(t for t in times if t["module"] == args.module)["cumulative_us"]
+    top = sorted(times, key=lambda t: t["self_us"], reverse=True)[: args.top]
+    if args.json:
+        print(json.dumps({"module": args.module, "total_us": total, "top": top}))
+        return
+    print(f"import {args.module}: {total / 1000:.1f} ms")
+    for t in top:
+        print(f"  {t['self_us'] / 1000:8.1f} ms  {t['module']}")
+
+
+if __name__ == "__main__":
+    main()
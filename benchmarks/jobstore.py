@@ -0,0 +1,79 @@
+# Dedup lookup cost as the job store grows, against the old TinyDB db.json
+# search when tinydb is installed, plus a check that the db.json migration
+# carries every id across.
+#
+#   python -m benchmarks.jobstore --rows 10000 100000 1000000
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import jobstore
+
+
+def fill(store, start: int, stop: int):
+    now = time.time()
+    db = store.db()
+    with db:
+        db.executemany(
+            "INSERT INTO jobs (id, state, created, updated) VALUES (?, ?, ?, ?)",
+            ((f"c{idx}", jobstore.DONE, now, now) for idx in range(start, stop)),
+        )
+
+
+def time_lookups(contains, n_rows: int, n_lookups: int = 2000):
+    start = time.perf_counter()
+    for idx in range(n_lookups):
+        # half hits, half misses
+        contains(f"c{(idx * 7919) % (n_rows * 2)}")
+    return (time.perf_counter() - start) / n_lookups
+
+
+def tinydb_lookup(tmp_dir: str, n_rows: int):
+    try:
+        from tinydb import TinyDB, Query
+    except ImportError:
+        return None
+    db = TinyDB(os.path.join(tmp_dir, f"db{n_rows}.json"))
+    db.insert_multiple({"id": f"c{idx}"} for idx in range(n_rows))
+    User = Query()
+    return time_lookups(
+        lambda job_id: len(db.search(User.id == job_id)) > 0, n_rows, 50
+    )
+
+
+def check_migration(tmp_dir: str):
+    path = os.path.join(tmp_dir, "db.json")
+    with open(path, "w") as f:
+        json.dump({"_default": {str(idx): {"id": f"m{idx}"} for idx in range(500)}}, f)
+    store = jobstore.JobStore(os.path.join(tmp_dir, "migrated.db"))
+    assert store.migrate_tinydb(path) == 500
+    assert store.migrate_tinydb(path) == 0
+    assert "m499" in store and store.get("m0")["state"] == jobstore.DONE
+    assert not store.add("m1")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--tinydb-max", type=int, default=10000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        check_migration(tmp_dir)
+        store = jobstore.JobStore(os.path.join(tmp_dir, "jobs.db"))
+        filled = 0
+        print(f"{'rows':>10} {'sqlite':>10} {'tinydb':>10}")
+        for n_rows in sorted(args.rows):
+            fill(store, filled, n_rows)
+            filled = n_rows
+            sqlite_s = time_lookups(store.__contains__, n_rows)
+            tinydb_s = None
+            if n_rows <= args.tinydb_max:
+                tinydb_s = tinydb_lookup(tmp_dir, n_rows)
+            tinydb_col = "-" if tinydb_s is None else f"{tinydb_s * 1e6:8.1f}us"
+            print(f"{n_rows:10d} {sqlite_s * 1e6:8.1f}us {tinydb_col:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# Peak RSS of do_video against thread length, for the eager and lazy scene paths.
+# Every measurement runs in its own process since ru_maxrss never goes down.
+#
+#   python -m benchmarks.memory --comments 5 10 20 30
+import argparse
+import json
+import resource
+import subprocess
+import sys
+
+
+def measure(n_comments: int, lazy: bool):
+    import anim
+    from benchmarks.common import synthetic_config
+
+    anim.do_video(synthetic_config(n_comments), lazy=lazy)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--comments", type=int, nargs="+", default=[5, 10, 20, 30])
+    parser.add_argument("--child", nargs=2, metavar=("N_COMMENTS", "MODE"))
+    args = parser.parse_args()
+    if args.child is not None:
+        print(measure(int(args.child[0]), args.child[1] == "lazy"))
+        return
+    results = []
+    for n_comments in args.comments:
+        for mode in ("eager", "lazy"):
+            command = [sys.executable, "-m", "benchmarks.memory"]
+            command += ["--child", str(n_comments), mode]
+            output = subprocess.run(
+                command,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            peak_kb = int(output.strip().splitlines()[-1])
+            results.append(
+                {"comments": n_comments, "mode": mode, "peak_rss_kb": peak_kb}
+            )
+            print(f"{n_comments:>4} comments  {mode:<5}  {peak_kb / 1024:8.1f} MB")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Job throughput through the job store queue as render workers are added,
+# with a stand-in render that just sleeps, plus a check that a job held by
+# a killed worker goes back to the queue.
+#
+#   python -m benchmarks.queue --jobs 40 --render 0.1 --workers 1 2 4
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import jobstore
+
+
+def fake_worker(path: str, render: float):
+    jobs = jobstore.JobStore(path)
+    while True:
+        job = jobs.claim()
+        if job is None:
+            return
+        time.sleep(render)
+        jobs.set_state(job["id"], jobstore.DONE)
+
+
+def hang(path: str):
+    jobstore.JobStore(path).claim()
+    time.sleep(60)
+
+
+def run(path: str, n_jobs: int, n_workers: int, render: float):
+    jobs = jobstore.JobStore(path)
+    for idx in range(n_jobs):
+        jobs.add(f"job{n_workers}_{idx}", source="benchmark")
+    start = time.perf_counter()
+    processes = [
+        multiprocessing.Process(target=fake_worker, args=(path, render))
+        for _ in range(n_workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+    assert jobs.queued() == 0
+    return elapsed
+
+
+def check_crash(path: str):
+    jobs = jobstore.JobStore(path)
+    jobs.add("crash", source="benchmark")
+    process = multiprocessing.Process(target=hang, args=(path,))
+    process.start()
+    while jobs.get("crash")["state"] != jobstore.RENDERING:
+        time.sleep(0.01)
+    process.kill()
+    process.join()
+    for job_id in jobs.held_by(process.pid):
+        jobs.retry(job_id, "worker died", max_attempts=3, backoff=0)
+    job = jobs.get("crash")
+    assert job["state"] == jobstore.QUEUED and job["attempts"] == 1
+    assert jobs.claim()["id"] == "crash"
+    jobs.retry("crash", "again", max_attempts=2, backoff=0)
+    assert jobs.get("crash")["state"] == jobstore.FAILED
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--render", type=float, default=0.1, help="s/job")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "jobs.db")
+        check_crash(path)
+        print(f"{'workers':>8} {'jobs/s':>8}")
+        for n_workers in args.workers:
+            elapsed = run(path, args.jobs, n_workers, args.render)
+            print(f"{n_workers:8d} {args.jobs / elapsed:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# Time per job for a stream of summons where popular threads are summoned
+# more than once, rendering everything versus going through the render
+# cache, with a cache budget small enough to evict.
+#
+#   python -m benchmarks.render_cache --threads 6 --jobs 20 --comments 3
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import anim
+import render_cache
+from benchmarks.common import synthetic_config
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=6)
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--comments", type=int, default=3)
+    parser.add_argument("--cache-mb", type=float, default=1.0)
+    args = parser.parse_args()
+    rnd = random.Random(0)
+    configs = [synthetic_config(args.comments, seed) for seed in range(args.threads)]
+    # a few threads get most of the summons
+    weights = [1 / (idx + 1) for idx in range(args.threads)]
+    summons = rnd.choices(range(args.threads), weights, k=args.jobs)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output = os.path.join(tmp_dir, "output.mp4")
+        start = time.perf_counter()
+        for thread in summons:
+            anim.ace_attorney_anim(configs[thread], output_filename=output)
+        uncached = (time.perf_counter() - start) / args.jobs
+
+        cache = render_cache.RenderCache(
+            os.path.join(tmp_dir, "cache"), int(args.cache_mb * 1024 * 1024)
+        )
+        start = time.perf_counter()
+        for idx, thread in enumerate(summons):
+            key = render_cache.config_key(configs[thread], fps=anim.fps)
+            cached = cache.lookup(key)
+            if cached is not None and cached["url"] is not None:
+                continue
+            if cached is None or not cache.fetch(key, output):
+                anim.ace_attorney_anim(configs[thread], output_filename=output)
+                cache.put(key, output)
+                # every other render gets "uploaded"
+                if idx % 2 == 0:
+                    cache.set_url(key, f"https://example.com/{key[:8]}")
+        cached_s = (time.perf_counter() - start) / args.jobs
+        stats = cache.stats()
+        on_disk = sum(
+            os.path.getsize(os.path.join(cache.directory, name))
+            for name in os.listdir(cache.directory)
+            if name.endswith(".mp4")
+        )
+        assert on_disk <= cache.max_bytes
+        assert stats["hits"] + stats["misses"] == args.jobs
+
+    print(f"uncached  {uncached:6.2f} s/job")
+    print(f"cached    {cached_s:6.2f} s/job")
+    print(f"hit rate  {stats['hit_rate']:6.2f} ({stats['hits']}/{args.jobs})")
+    print(f"on disk   {on_disk / 1024:6.0f} kB of {cache.max_bytes / 1024:.0f} kB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# Render time for a thread after an overlapping one (the same comments with
+# one dropped from the top and one new at the bottom) with and without the
+# per-line segment cache, plus a check that the cached video decodes to the
+# same frames whether its lines came from the cache or were drawn fresh.
+# Both threads are cast and given emotions the way the worker does it, each
+# under its own seed.
+#
+#   python -m benchmarks.segments --comments 10
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+import anim
+import render_cache
+from benchmarks.common import Comment, synthetic_text
+
+
+def decode(path: str):
+    capture = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        frames.append(frame)
+    capture.release()
+    return np.stack(frames)
+
+
+def synthetic_thread(n_comments: int, seed: int = 0):
+    # user0 writes every other comment, so it stays the most common author
+    # with the top comment dropped
+    rnd = random.Random(seed)
+    return [
+        Comment(
+            "user0" if idx % 2 == 0 else f"user{1 + idx // 2 % 2}",
+            synthetic_text(rnd),
+            rnd.randint(-5, 50),
+        )
+        for idx in range(n_comments)
+    ]
+
+
+def thread_config(comments, seed: int):
+    context = anim.RenderContext(seed)
+    characters = anim.get_characters(
+        anim.most_common_authors(comments), context=context
+    )
+    return anim.comments_to_config(comments, characters, context=context)
+
+
+def timed(config, output_path: str, **kwargs):
+    start = time.perf_counter()
+    anim.ace_attorney_anim(config, output_filename=output_path, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--comments", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    comments = synthetic_thread(args.comments + 2)
+    # different seeds, as the worker derives them from the thread's comments
+    first = thread_config(comments[:-1], seed=0)
+    second = thread_config(comments[1:], seed=1)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = render_cache.RenderCache(
+            os.path.join(tmp_dir, "segments"), 1024 * 1024 * 1024
+        )
+        full = timed(second, os.path.join(tmp_dir, "full.mp4"), workers=args.workers)
+        cold = timed(
+            first,
+            os.path.join(tmp_dir, "first.mp4"),
+            workers=args.workers,
+            segment_cache=cache,
+        )
+        warm_path = os.path.join(tmp_dir, "warm.mp4")
+        warm = timed(second, warm_path, workers=args.workers, segment_cache=cache)
+        stats = cache.stats()
+
+        # the same thread drawn without any cached lines
+        fresh_cache = render_cache.RenderCache(
+            os.path.join(tmp_dir, "fresh"), 1024 * 1024 * 1024
+        )
+        fresh_path = os.path.join(tmp_dir, "fresh.mp4")
+        timed(second, fresh_path, workers=args.workers, segment_cache=fresh_cache)
+        warm_frames, fresh_frames = decode(warm_path), decode(fresh_path)
+        assert warm_frames.shape == fresh_frames.shape
+        assert len(warm_frames) == len(decode(os.path.join(tmp_dir, "full.mp4")))
+        diff = np.abs(warm_frames.astype(int) - fresh_frames.astype(int)).max()
+
+    print(f"uncached          {full:6.2f}s")
+    print(f"segments, cold    {cold:6.2f}s (first thread)")
+    print(f"segments, warm    {warm:6.2f}s (overlapping thread)")
+    print(f"segment hit rate  {stats['hit_rate']:6.2f}")
+    print(f"max pixel diff cached vs fresh lines: {diff}")
+    assert stats["hit_rate"] > 0, "the overlapping thread reused no segments"
+    assert diff == 0, "cached lines differ from freshly drawn ones"
+
+
+if __name__ == "__main__":
+    main()
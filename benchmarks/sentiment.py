@@ -0,0 +1,77 @@
+# Per-thread preprocessing latency (spaCy + sentiment) with the old
+# TextBlob detect_language/translate scoring, the offline analyzer, and the
+# offline analyzer once its cache is warm.
+#
+#   python -m benchmarks.sentiment --threads 5 --comments 30 [--network]
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import anim
+import sentiment
+from benchmarks.common import Comment, synthetic_text
+
+
+class LegacySentiment(sentiment.SentimentAnalyzer):
+    # the old behaviour: two blocking web requests per comment
+    name = "legacy"
+
+    def analyze(self, text: str):
+        from textblob import TextBlob
+
+        blob = TextBlob(text)
+        try:
+            language = blob.detect_language() if len(text) >= 3 else "en"
+            if language != "en":
+                return language, blob.translate(to="en").sentiment.polarity
+            return language, blob.sentiment.polarity
+        except Exception:
+            return "en", blob.sentiment.polarity
+
+
+def synthetic_threads(n_threads: int, n_comments: int, seed: int = 0):
+    # overlapping threads share most of their comments, as summons on the
+    # same chain do
+    rnd = random.Random(seed)
+    pool = [
+        Comment(f"user{idx % 7}", synthetic_text(rnd)) for idx in range(n_comments * 2)
+    ]
+    return [
+        pool[offset : offset + n_comments]
+        for offset in (rnd.randint(0, n_comments) for _ in range(n_threads))
+    ]
+
+
+def time_threads(threads, analyzer):
+    start = time.perf_counter()
+    for comments in threads:
+        anim.preprocess_comments(comments, analyzer=analyzer)
+    return (time.perf_counter() - start) / len(threads)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=5)
+    parser.add_argument("--comments", type=int, default=30)
+    parser.add_argument("--network", action="store_true", help="include legacy")
+    args = parser.parse_args()
+    threads = synthetic_threads(args.threads, args.comments)
+    # load spaCy before timing anything
+    anim.preprocess_comments(threads[0][:1], analyzer=sentiment.OfflineSentiment())
+    if args.network:
+        legacy = time_threads(threads, LegacySentiment())
+        print(f"legacy        {legacy * 1000:8.1f} ms/thread")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        analyzer = sentiment.CachedSentiment(
+            sentiment.OfflineSentiment(), os.path.join(tmp_dir, "sentiment.db")
+        )
+        cold = time_threads(threads, analyzer)
+        warm = time_threads(threads, analyzer)
+    print(f"offline cold  {cold * 1000:8.1f} ms/thread")
+    print(f"offline warm  {warm * 1000:8.1f} ms/thread")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# Listing requests per minute and mention-to-detection latency for the
+# subreddits in subreddits.txt, polling each one in turn as the bot used to
+# versus the combined adaptive streams. Reddit is simulated on a fake clock
+# with made up per-subreddit comment rates, so this runs offline.
+#
+#   python -m benchmarks.streams --minutes 30
+import argparse
+import random
+
+import streams
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+class StubComment:
+    def __init__(self, comment_id: str, subreddit: str, created: float):
+        self.id = comment_id
+        self.subreddit = subreddit
+        self.created = created
+        self.body = ""
+
+
+class StubListing:
+    def __init__(self, reddit, names):
+        self.reddit = reddit
+        self.names = set(names.split("+"))
+
+    def comments(self, limit: int = 100):
+        self.reddit.requests += 1
+        self.reddit.clock.sleep(self.reddit.latency)
+        return self.reddit.newest(self.names, limit)
+
+
+class StubReddit:
+    def __init__(self, subreddits, clock: Clock, latency: float, seed: int = 0):
+        rnd = random.Random(seed)
+        self.clock = clock
+        self.latency = latency
+        self.requests = 0
+        # a handful of busy subreddits and a long quiet tail, comments/s
+        self.rates = {
+            name: rnd.choice([2.0, 0.5]) if idx < 5 else rnd.expovariate(1 / 0.02)
+            for idx, name in enumerate(subreddits)
+        }
+        self.rnd = rnd
+        self.comments = []
+        self.generated_until = 0.0
+
+    def generate(self):
+        # comments since the last call, in creation order
+        start, end = self.generated_until, self.clock()
+        events = []
+        for name, rate in self.rates.items():
+            t = start + self.rnd.expovariate(rate)
+            while t < end:
+                events.append((t, name))
+                t += self.rnd.expovariate(rate)
+        for t, name in sorted(events):
+            self.comments.append(StubComment(f"c{len(self.comments)}", name, t))
+        self.generated_until = end
+
+    def newest(self, names, limit: int):
+        self.generate()
+        found = []
+        for comment in reversed(self.comments):
+            if comment.subreddit in names:
+                found.append(comment)
+                if len(found) == limit:
+                    break
+        return found
+
+    def subreddit(self, names: str):
+        return StubListing(self, names)
+
+
+def legacy(subreddits, minutes: float, latency: float):
+    # one listing per subreddit, round robin, as the praw streams did
+    clock = Clock()
+    reddit = StubReddit(subreddits, clock, latency)
+    seen = set()
+    latencies = []
+    first = True
+    while clock() < minutes * 60:
+        for name in subreddits:
+            for comment in reddit.subreddit(name).comments(limit=100):
+                if comment.id not in seen:
+                    seen.add(comment.id)
+                    if not first:
+                        latencies.append(clock() - comment.created)
+        first = False
+    return reddit, latencies, len(reddit.comments) - len(seen)
+
+
+def combined(subreddits, minutes: float, latency: float):
+    clock = Clock()
+    reddit = StubReddit(subreddits, clock, latency)
+    stream = streams.MultiStream(reddit, subreddits, clock=clock, sleep=clock.sleep)
+    n_groups = len(stream.groups)
+    seen = set()
+    latencies = []
+    while clock() < minutes * 60:
+        for comment in stream.poll_next():
+            seen.add(comment.id)
+            if comment.created > latency * n_groups:
+                latencies.append(clock() - comment.created)
+    return reddit, latencies, len(reddit.comments) - len(seen), stream
+
+
+def percentile(values, q: float):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--minutes", type=float, default=30)
+    parser.add_argument("--latency", type=float, default=0.3, help="s/request")
+    args = parser.parse_args()
+    with open("subreddits.txt", "r") as sublst:
+        subreddits = [sub.strip(" \n") for sub in sublst if sub.strip(" \n") != ""]
+
+    print(f"{'':10} {'req/min':>8} {'p50':>8} {'p99':>8} {'max':>8} {'missed':>7}")
+    reddit, latencies, missed = legacy(subreddits, args.minutes, args.latency)
+    legacy_rpm = reddit.requests / args.minutes
+    print(
+        f"{'legacy':10} {legacy_rpm:8.1f} {percentile(latencies, 0.5):7.1f}s "
+        f"{percentile(latencies, 0.99):7.1f}s {max(latencies):7.1f}s {missed:7d}"
+    )
+    reddit, latencies, missed, stream = combined(subreddits, args.minutes, args.latency)
+    rpm = reddit.requests / args.minutes
+    print(
+        f"{'combined':10} {rpm:8.1f} {percentile(latencies, 0.5):7.1f}s "
+        f"{percentile(latencies, 0.99):7.1f}s {max(latencies):7.1f}s {missed:7d}"
+    )
+    print(f"{len(subreddits)} subreddits in {len(stream.groups)} streams")
+    assert rpm < legacy_rpm
+    assert max(latencies) <= streams.max_interval + args.latency * len(stream.groups)
+
+
+if __name__ == "__main__":
+    main()
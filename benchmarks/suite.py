@@ -0,0 +1,188 @@
+# End to end render benchmark over synthetic comment chains: frames/s, audio
+# build, mux, peak RSS and output size per scenario, written to JSON so runs
+# can be compared. Chains are stub comments fed through get_characters and
+# comments_to_config + ace_attorney_anim (what comments_to_scene runs), with
+# a fixed seed and no network. Each scenario runs in its own process for a
+# clean peak RSS.
+#
+#   python -m benchmarks.suite --output before.json
+#   python -m benchmarks.suite --output after.json --compare before.json
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+scenarios = {
+    "short": {"comments": 3, "authors": 2, "words": (4, 12)},
+    "long": {"comments": 20, "authors": 3, "words": (4, 20)},
+    "many_authors": {"comments": 12, "authors": 8, "words": (4, 20)},
+    "long_text": {"comments": 5, "authors": 2, "words": (40, 80)},
+    "objections": {"comments": 8, "authors": 3, "words": (4, 20), "objections": 0.6},
+    "shakes": {"comments": 8, "authors": 3, "words": (4, 20), "shakes": 0.5},
+}
+
+
+def synthetic_chain(scenario, seed: int):
+    from benchmarks.common import Comment, synthetic_text
+
+    rnd = random.Random(seed)
+    min_words, max_words = scenario["words"]
+    chain = []
+    for idx in range(scenario["comments"]):
+        score = rnd.randint(1, 50)
+        body = synthetic_text(rnd, min_words, max_words)
+        if rnd.random() < scenario.get("objections", 0):
+            score = -score
+        chain.append(Comment(f"user{idx % scenario['authors']}", body, score))
+    return chain
+
+
+def add_shakes(config, rate: float, rnd: random.Random):
+    # comments never produce shakes, so put some after text lines
+    import anim
+
+    for scene in config:
+        objs = []
+        for obj in scene["scene"]:
+            objs.append(obj)
+            if obj["action"] == anim.Action.TEXT and rnd.random() < rate:
+                objs.append({"action": anim.Action.SHAKE_EFFECT})
+        scene["scene"] = objs
+
+
+def stage_seconds(spans, name: str):
+    return sum(
+        (child["seconds"] if child["name"] == name else 0)
+        + stage_seconds(child, name)
+        for child in spans["children"]
+    )
+
+
+def measure(name: str, seed: int, engine: str, workers: int):
+    import anim
+    import metrics
+
+    scenario = scenarios[name]
+    context = anim.RenderContext(seed)
+    chain = synthetic_chain(scenario, seed)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, "output.mp4")
+        with metrics.job(name, report=False) as record:
+            most_common = anim.most_common_authors(chain)
+            characters = anim.get_characters(most_common, context=context)
+            with metrics.span("config"):
+                config = anim.comments_to_config(chain, characters, context=context)
+            add_shakes(config, scenario.get("shakes", 0), random.Random(seed))
+            anim.ace_attorney_anim(
+                config,
+                output_filename=output_path,
+                engine=engine,
+                workers=workers,
+                context=context,
+            )
+        size = os.path.getsize(output_path)
+    spans = record["spans"]
+    frames = record["counters"].get("frames_encoded", 0)
+    video = stage_seconds(spans, "video")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "scenario": name,
+        "frames": frames,
+        "fps": frames / video if video > 0 else 0.0,
+        "config_s": stage_seconds(spans, "config"),
+        "audio_s": stage_seconds(spans, "audio"),
+        "video_s": video,
+        "mux_s": stage_seconds(spans, "mux") + stage_seconds(spans, "concat"),
+        "total_s": spans["seconds"],
+        "peak_rss_kb": peak,
+        "output_bytes": size,
+    }
+
+
+def git_commit():
+    repo = os.path.dirname(os.path.abspath(__file__))
+    try:
+        return subprocess.run(
+            ["git", "-C", repo, "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path: str):
+    with open(baseline_path, "r") as f:
+        baseline = {row["scenario"]: row for row in json.load(f)["results"]}
+    print(f"\nagainst {baseline_path}")
+    for row in results:
+        old = baseline.get(row["scenario"])
+        if old is None:
+            continue
+        changes = []
+        for field in ("fps", "audio_s", "mux_s", "peak_rss_kb", "output_bytes"):
+            if old[field]:
+                changes.append(f"{field} {row[field] / old[field] - 1:+.0%}")
+        print(f"{row['scenario']:14} " + "  ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", nargs="+", default=list(scenarios))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engine", default="pil")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--compare", help="an earlier --output to diff against")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child is not None:
+        print(json.dumps(measure(args.child, args.seed, args.engine, args.workers)))
+        return
+
+    results = []
+    header = f"{'scenario':14} {'frames':>7} {'fps':>7} {'audio':>7} {'mux':>7}"
+    print(f"{header} {'rss MB':>7} {'size kB':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # keep the sentiment cache out of the way and cold
+        env = dict(os.environ, sentiment_cache=os.path.join(tmp_dir, "s.db"))
+        for name in args.scenarios:
+            command = [sys.executable, "-m", "benchmarks.suite", "--child", name]
+            command += ["--seed", str(args.seed), "--engine", args.engine]
+            command += ["--workers", str(args.workers)]
+            output = subprocess.run(
+                command, check=True, capture_output=True, text=True, env=env
+            ).stdout
+            row = json.loads(output.strip().splitlines()[-1])
+            results.append(row)
+            print(
+                f"{name:14} {row['frames']:7d} {row['fps']:7.1f} "
+                f"{row['audio_s']:6.2f}s {row['mux_s']:6.2f}s "
+                f"{row['peak_rss_kb'] / 1024:7.1f} {row['output_bytes'] / 1024:8.0f}"
+            )
+    run = {
+        "timestamp": time.time(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "engine": args.engine,
+        "workers": args.workers,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(run, f, indent=2)
+    print(f"wrote {args.output}")
+    if args.compare is not None:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# Per-frame cost of rendering the typewriter dialogue text, before and after
+# the font cache and incremental rasterisation.
+#
+#   python -m benchmarks.text --repeat 20
+import argparse
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+import anim
+
+
+def legacy_render(text: anim.AnimText, background: Image, frame: int):
+    draw = ImageDraw.Draw(background)
+    font = ImageFont.truetype(text.font_path, text.font_size)
+    draw.text((text.x, text.y), text.text[:frame], font=font, fill=text.colour)
+
+
+def run(render, text: str, repeat: int):
+    background = Image.new("RGBA", (256, 192), (0, 0, 0, 255))
+    frames = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        anim_text = anim.AnimText(
+            text,
+            font_path="assets/igiari/Igiari.ttf",
+            font_size=15,
+            x=5,
+            y=130,
+            typewriter_effect=True,
+        )
+        for frame in range(len(text)):
+            render(anim_text, background, frame)
+            frames += 1
+    return (time.perf_counter() - start) / frames
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    text = anim.split_str_into_newlines(
+        "Hold it! The witness just told us he was at home all night, "
+        "so how could he have seen the defendant at the scene?"
+    )
+    before = run(legacy_render, text, args.repeat)
+    after = run(lambda t, b, f: t.render(b, frame=f), text, args.repeat)
+    print(f"before  {before * 1e6:8.1f} us/frame")
+    print(f"after   {after * 1e6:8.1f} us/frame")
+    print(f"speedup {before / after:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# Uploads through each backend against a local mock server that fails a share
+# of requests, some of them halfway through the body. Checks every file
+# arrives intact and reports retries, resumes and throughput.
+#
+#   python -m benchmarks.uploads --files 8 --size 24 --failure-rate 0.3
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import tempfile
+import time
+
+import aiohttp
+from aiohttp import web
+
+import uploads
+
+
+def mock_server(failure_rate: float, seed: int = 0):
+    rnd = random.Random(seed)
+    stored = {}
+    stats = {"requests": 0, "failures": 0, "bytes": 0}
+
+    async def consume(read_chunk, fail: bool):
+        # a failing request reads part of the body, as a dropped connection
+        # would, and throws it away
+        data = bytearray()
+        while True:
+            chunk = await read_chunk(64 * 1024)
+            if len(chunk) == 0:
+                break
+            data += chunk
+            stats["bytes"] += len(chunk)
+            if fail and len(data) > 256 * 1024:
+                break
+        return bytes(data)
+
+    def should_fail():
+        stats["requests"] += 1
+        if rnd.random() < failure_rate:
+            stats["failures"] += 1
+            return True
+        return False
+
+    async def streamable(request):
+        fail = should_fail()
+        reader = await request.multipart()
+        part = await reader.next()
+        data = await consume(part.read_chunk, fail)
+        if fail:
+            return web.Response(status=503)
+        name = part.filename
+        stored[name] = data
+        return web.json_response({"shortcode": name})
+
+    async def head(request):
+        name = request.match_info["name"]
+        if name not in stored:
+            return web.Response(status=404)
+        return web.Response(headers={"Upload-Offset": str(len(stored[name]))})
+
+    async def put(request):
+        name = request.match_info["name"]
+        fail = should_fail()
+        start, total = request.headers["Content-Range"][6:].split("/")
+        start = int(start.split("-")[0])
+        if start != len(stored.get(name, b"")):
+            return web.Response(status=409)
+        data = await consume(request.content.read, fail)
+        if fail:
+            return web.Response(status=503)
+        stored[name] = stored.get(name, b"") + data
+        return web.Response(status=200 if len(stored[name]) == int(total) else 308)
+
+    app = web.Application(client_max_size=1024 * 1024 * 1024)
+    app.router.add_post("/upload", streamable)
+    app.router.add_route("HEAD", "/files/{name}", head)
+    app.router.add_put("/files/{name}", put)
+    return app, stored, stats
+
+
+async def run(backend_name: str, paths, args, tmp_dir: str):
+    app, stored, stats = mock_server(args.failure_rate)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    uploads.streamable_api_url = f"http://127.0.0.1:{port}"
+    async with aiohttp.ClientSession() as session:
+        if backend_name == "streamable":
+            backend = uploads.StreamableUpload(session, "user", "password")
+        elif backend_name == "http":
+            backend = uploads.HTTPUpload(
+                session, f"http://127.0.0.1:{port}/files", 4 * 1024 * 1024
+            )
+        else:
+            backend = uploads.LocalUpload(os.path.join(tmp_dir, "served"))
+        uploader = uploads.Uploader(backend, args.concurrency, 20, 0.01, 0.1)
+        start = time.perf_counter()
+        await asyncio.gather(*(uploader.upload(path) for path in paths))
+        elapsed = time.perf_counter() - start
+    await runner.cleanup()
+
+    for path in paths:
+        name = os.path.basename(path)
+        with open(path, "rb") as f:
+            expected = hashlib.sha1(f.read()).hexdigest()
+        if backend_name == "local":
+            with open(os.path.join(tmp_dir, "served", name), "rb") as f:
+                data = f.read()
+        else:
+            data = stored[name]
+        assert hashlib.sha1(data).hexdigest() == expected, f"{name} corrupted"
+    total = sum(os.path.getsize(path) for path in paths)
+    resumed = getattr(backend, "resumed", 0)
+    return total / elapsed / 1024 / 1024, uploader.retries, resumed, stats["bytes"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--size", type=int, default=24, help="MB per file")
+    parser.add_argument("--failure-rate", type=float, default=0.3)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = []
+        for idx in range(args.files):
+            path = os.path.join(tmp_dir, f"video{idx}.mp4")
+            with open(path, "wb") as f:
+                f.write(os.urandom(args.size * 1024 * 1024))
+            paths.append(path)
+        total = args.files * args.size
+        print(f"{'backend':12} {'MB/s':>8} {'retries':>8} {'resumed':>8} {'sent':>6}")
+        for backend_name in ("streamable", "http", "local"):
+            rate, retries, resumed, sent = asyncio.run(
+                run(backend_name, paths, args, tmp_dir)
+            )
+            sent_ratio = sent / 1024 / 1024 / total
+            print(
+                f"{backend_name:12} {rate:8.1f} {retries:8d} {resumed:8d} "
+                f"{sent_ratio:5.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
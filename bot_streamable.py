@@ -2,22 +2,17 @@ import os
 import sys
 import praw
 import re
-from tinydb import TinyDB, Query
-import anim
-from collections import Counter
-import spaw
-
-streamable_username = os.environ.get("streamable_username")
-streamable_password = os.environ.get("streamable_password")
+import jobstore
+from streams import MultiStream
 
 reddit_client_id = os.environ.get("reddit_client_id")
 reddit_client_secret = os.environ.get("reddit_client_secret")
 reddit_refresh_token = os.environ.get("reddit_refresh_token")
 
-_spaw = spaw.SPAW()
-_spaw.auth(streamable_username, streamable_password)
+max_queued = int(os.environ.get("max_queued", 100))
 
-db = TinyDB("db.json")
+jobs = jobstore.JobStore()
+jobs.migrate_tinydb("db.json")
 
 reddit = praw.Reddit(
     client_id=reddit_client_id,
@@ -32,69 +27,14 @@ with open("subreddits.txt", "r") as sublst:
 
 print("starting...")
 
-
-def get_comment_chain(comment):
-    if not isinstance(comment, praw.models.Comment):
-        return
-    parent_comment = get_comment_chain(comment.parent())
-    if parent_comment is not None:
-        return [comment, *parent_comment]
-    else:
-        return [comment]
-
-
-def get_submission(comment):
-    if not isinstance(comment, praw.models.Comment):
-        return comment
-    else:
-        return get_submission(comment.parent())
-
-
-def init_stream(subreddit_name: str):
-    subreddit = reddit.subreddit(subreddit_name)
-    return subreddit.stream.comments(pause_after=-1)
-
-
-User = Query()
-comment_streams = [init_stream(subreddit) for subreddit in subreddits]
-while True:
-    for comment_stream in comment_streams:
-        for comment in comment_stream:
-            if comment is None:
-                break
-            if re.search("!objection-*bot", comment.body, re.IGNORECASE):
-                if len(db.search(User.id == comment.id)) == 0:
-                    try:
-                        print(
-                            f"doing {comment.id} (https://www.reddit.com{comment.permalink})"
-                        )
-
-                        # handle metadata
-                        print(f"handling metadata...")
-                        db.insert({"id": comment.id})
-                        comments = list(reversed(get_comment_chain(comment)))[:-1]
-                        authors = [comment.author.name for comment in comments]
-                        most_common = [t[0] for t in Counter(authors).most_common()]
-                        submission = get_submission(comment)
-
-                        # generate video
-                        output_filename = f"{comment.id}.mp4"
-                        print(f"generating video {output_filename}...")
-                        characters = anim.get_characters(most_common)
-                        anim.comments_to_scene(
-                            comments, characters, output_filename=output_filename
-                        )
-
-                        # upload video
-                        print(f"uploading video...")
-                        response = _spaw.videoUpload(output_filename)
-                        print(response)
-                        comment.reply(
-                            f"""[Here's the video!](https://streamable.com/{response['shortcode']})
-
-                            (btw, I now work on all subreddits if you mention my username directly)"""
-                        )
-
-                        print(f"done {comment.id}")
-                    except Exception as e:
-                        print(e)
+# only queues the summons, worker.py renders and replies
+comment_stream = MultiStream(reddit, subreddits)
+print(f"{len(subreddits)} subreddits in {len(comment_stream.groups)} streams")
+for comment in comment_stream:
+    if re.search("!objection-*bot", comment.body, re.IGNORECASE):
+        if comment.id not in jobs:
+            jobs.wait_for_room(max_queued)
+            if jobs.add(comment.id, source="streamable"):
+                print(
+                    f"queued {comment.id} (https://www.reddit.com{comment.permalink})"
+                )
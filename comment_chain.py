@@ -0,0 +1,65 @@
+from collections import OrderedDict
+from typing import List
+
+
+class CommentChainResolver:
+    # walks comment chains up to their top level comment without recursion,
+    # asking for parents in batches of up to 100 fullnames (for reddit's
+    # /api/info) and remembering every comment it has seen, so overlapping
+    # chains from different jobs only fetch what is new
+    def __init__(self, cache_size: int = 10000, batch_size: int = 100):
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.requests = 0
+        self.hits = 0
+        self.misses = 0
+
+    def remember(self, comment):
+        self.cache[comment.fullname] = comment
+        self.cache.move_to_end(comment.fullname)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def lookup(self, fullname: str):
+        comment = self.cache.get(fullname)
+        if comment is not None:
+            self.cache.move_to_end(fullname)
+        return comment
+
+    def batches(self, fullnames: List[str]):
+        for start in range(0, len(fullnames), self.batch_size):
+            self.requests += 1
+            yield fullnames[start : start + self.batch_size]
+
+    def walk(self, comments: List):
+        # the resolving loop without any I/O: each round yields the fullnames
+        # it needs and expects them cached when resumed, the caller
+        # (AsyncReddit.get_chain) does the fetching. Each chain is
+        # [comment, parent, ..., top level comment]
+        chains = [[comment] for comment in comments]
+        for comment in comments:
+            self.remember(comment)
+        pending = list(chains)
+        while len(pending) > 0:
+            missing = set()
+            still_pending = []
+            for chain in pending:
+                # follow everything that is already cached
+                while chain[-1].parent_id.startswith("t1_"):
+                    parent = self.lookup(chain[-1].parent_id)
+                    if parent is None:
+                        break
+                    self.hits += 1
+                    chain.append(parent)
+                if chain[-1].parent_id.startswith("t1_"):
+                    missing.add(chain[-1].parent_id)
+                    still_pending.append(chain)
+            self.misses += len(missing)
+            if len(missing) > 0:
+                yield sorted(missing)
+            # parents that could not be fetched (deleted, removed) end the chain
+            pending = [
+                chain for chain in still_pending if chain[-1].parent_id in self.cache
+            ]
+        return chains
@@ -0,0 +1,281 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+QUEUED = "queued"
+RENDERING = "rendering"
+UPLOADING = "uploading"
+DONE = "done"
+FAILED = "failed"
+states = (QUEUED, RENDERING, UPLOADING, DONE, FAILED)
+
+default_path = os.environ.get("job_store", "jobs.db")
+
+columns = (
+    "id",
+    "state",
+    "created",
+    "updated",
+    "output",
+    "error",
+    "source",
+    "attempts",
+    "not_before",
+    "worker",
+)
+# added after the first version of the table, see JobStore.db
+added_columns = {
+    "source": "TEXT",
+    "attempts": "INTEGER NOT NULL DEFAULT 0",
+    "not_before": "REAL NOT NULL DEFAULT 0",
+    "worker": "TEXT",
+}
+
+
+def pid_alive(pid: int) -> bool:
+    if os.name == "nt":
+        # os.kill would terminate it there, assume it is still working
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # alive, owned by someone else
+        return True
+    return True
+
+
+class JobStore:
+    # one row per comment id the bots have picked up, in sqlite with WAL so
+    # several processes can read while one writes; id is the primary key so
+    # lookups stay constant however many comments have been handled
+    def __init__(self, path: str = default_path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = None
+        self.pid = None
+
+    def db(self):
+        # sqlite connections can't be shared with forked workers
+        if self.connection is None or self.pid != os.getpid():
+            self.connection = sqlite3.connect(
+                self.path, timeout=30, check_same_thread=False
+            )
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            with self.connection:
+                self.connection.execute(
+                    "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, "
+                    "state TEXT NOT NULL, created REAL NOT NULL, "
+                    "updated REAL NOT NULL, output TEXT, error TEXT)"
+                )
+                existing = {
+                    row[1]
+                    for row in self.connection.execute("PRAGMA table_info(jobs)")
+                }
+                for name, kind in added_columns.items():
+                    if name not in existing:
+                        self.connection.execute(
+                            f"ALTER TABLE jobs ADD COLUMN {name} {kind}"
+                        )
+                self.connection.execute(
+                    "CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created)"
+                )
+            self.pid = os.getpid()
+        return self.connection
+
+    def __contains__(self, job_id: str):
+        with self.lock:
+            row = self.db().execute(
+                "SELECT 1 FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return row is not None
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self.lock:
+            row = self.db().execute(
+                f"SELECT {', '.join(columns)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(columns, row))
+
+    def add(self, job_id: str, state: str = QUEUED, source: str = None) -> bool:
+        # False if the id was already there, so two listeners can't both
+        # pick up the same comment
+        now = time.time()
+        with self.lock:
+            db = self.db()
+            with db:
+                cursor = db.execute(
+                    "INSERT OR IGNORE INTO jobs (id, state, created, updated, source) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (job_id, state, now, now, source),
+                )
+        return cursor.rowcount == 1
+
+    def queued(self) -> int:
+        with self.lock:
+            row = self.db().execute(
+                "SELECT COUNT(*) FROM jobs WHERE state = ?", (QUEUED,)
+            ).fetchone()
+        return row[0]
+
+    def claim(self) -> Optional[Dict]:
+        # hand the oldest due job to this worker; the UPDATE is a single
+        # statement, so two workers can never claim the same row
+        token = f"{os.getpid()}-{uuid.uuid4().hex}"
+        now = time.time()
+        with self.lock:
+            db = self.db()
+            with db:
+                cursor = db.execute(
+                    "UPDATE jobs SET state = ?, updated = ?, worker = ?, "
+                    "attempts = attempts + 1 WHERE id = (SELECT id FROM jobs "
+                    "WHERE state = ? AND not_before <= ? ORDER BY created LIMIT 1)",
+                    (RENDERING, now, token, QUEUED, now),
+                )
+            if cursor.rowcount == 0:
+                return None
+            row = db.execute(
+                f"SELECT {', '.join(columns)} FROM jobs WHERE worker = ?", (token,)
+            ).fetchone()
+        return dict(zip(columns, row))
+
+    def retry(self, job_id: str, error: str, max_attempts: int, backoff: float):
+        # back to the queue with exponential backoff, or failed for good
+        with self.lock:
+            db = self.db()
+            with db:
+                db.execute(
+                    "UPDATE jobs SET "
+                    "state = CASE WHEN attempts < ? THEN ? ELSE ? END, "
+                    "not_before = ? * (1 << MAX(attempts - 1, 0)) + ?, "
+                    "updated = ?, error = ?, worker = NULL WHERE id = ?",
+                    (
+                        max_attempts,
+                        QUEUED,
+                        FAILED,
+                        backoff,
+                        time.time(),
+                        time.time(),
+                        error,
+                        job_id,
+                    ),
+                )
+
+    def held_by(self, pid: int):
+        # ids a worker process was holding when it died
+        with self.lock:
+            rows = self.db().execute(
+                "SELECT id FROM jobs WHERE state IN (?, ?) AND worker LIKE ?",
+                (RENDERING, UPLOADING, f"{pid}-%"),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def full(self, max_queued: int) -> bool:
+        # back-pressure for the listeners: hold off enqueueing while the
+        # workers are this far behind
+        return self.queued() >= max_queued
+
+    def wait_for_room(self, max_queued: int, interval: float = 5):
+        # blocks, for listeners that aren't running on an event loop
+        while self.full(max_queued):
+            time.sleep(interval)
+
+    def holders(self):
+        # pids of the workers holding RENDERING / UPLOADING jobs
+        with self.lock:
+            rows = self.db().execute(
+                "SELECT DISTINCT worker FROM jobs WHERE state IN (?, ?)",
+                (RENDERING, UPLOADING),
+            ).fetchall()
+        pids = set()
+        for (token,) in rows:
+            try:
+                pids.add(int((token or "").split("-")[0]))
+            except ValueError:
+                # claimed before there were worker tokens
+                pids.add(None)
+        return pids
+
+    def requeue_stale(self, max_attempts: int, backoff: float) -> int:
+        # jobs held by worker processes that are gone, or by this one from
+        # before it restarted under the same pid; live workers keep theirs.
+        # They count as failed attempts, so a job that kills its worker
+        # ends up FAILED instead of taking down every restart
+        stale = []
+        for pid in self.holders():
+            if pid is None:
+                with self.lock:
+                    rows = self.db().execute(
+                        "SELECT id FROM jobs WHERE state IN (?, ?) "
+                        "AND (worker IS NULL OR worker NOT LIKE '%-%')",
+                        (RENDERING, UPLOADING),
+                    ).fetchall()
+                stale.extend(row[0] for row in rows)
+            elif pid == os.getpid() or not pid_alive(pid):
+                stale.extend(self.held_by(pid))
+        for job_id in stale:
+            self.retry(job_id, "worker died", max_attempts, backoff)
+        return len(stale)
+
+    def set_state(
+        self, job_id: str, state: str, output: str = None, error: str = None
+    ):
+        if state not in states:
+            raise ValueError(f"unknown job state {state!r}")
+        with self.lock:
+            db = self.db()
+            with db:
+                db.execute(
+                    "UPDATE jobs SET state = ?, updated = ?, "
+                    "output = COALESCE(?, output), error = ? WHERE id = ?",
+                    (state, time.time(), output, error, job_id),
+                )
+
+    def counts(self) -> Dict[str, int]:
+        with self.lock:
+            rows = self.db().execute(
+                "SELECT state, COUNT(*) FROM jobs GROUP BY state"
+            ).fetchall()
+        return dict(rows)
+
+    def migrate_tinydb(self, path: str = "db.json") -> int:
+        # the old TinyDB store only kept ids; they were all handled, so they
+        # come across as done. Safe to run again, existing ids are kept.
+        if not os.path.exists(path):
+            return 0
+        with open(path, "r") as f:
+            data = json.load(f)
+        created = os.path.getmtime(path)
+        ids = [
+            str(doc["id"])
+            for table in data.values()
+            for doc in table.values()
+            if "id" in doc
+        ]
+        with self.lock:
+            db = self.db()
+            with db:
+                before = db.total_changes
+                db.executemany(
+                    "INSERT OR IGNORE INTO jobs (id, state, created, updated) "
+                    "VALUES (?, ?, ?, ?)",
+                    ((job_id, DONE, created, created) for job_id in ids),
+                )
+                return db.total_changes - before
+
+
+if __name__ == "__main__":
+    # python jobstore.py [db.json]
+    store = JobStore()
+    migrated = store.migrate_tinydb(sys.argv[1] if len(sys.argv) > 1 else "db.json")
+    print(f"migrated {migrated} ids into {store.path}")
+    print(store.counts())
@@ -0,0 +1,174 @@
+import contextlib
+import contextvars
+import cProfile
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict
+
+# nested timing spans and counters per job. A job's record is a plain dict,
+# so a render process can hand its part back to the worker, which merges it,
+# appends the finished record to metrics_log and keeps running totals for
+# the /metrics endpoint.
+metrics_log = os.environ.get("metrics_log", "jobs.jsonl")
+metrics_port = int(os.environ.get("metrics_port", 0))
+# dump a cProfile of the render for jobs slower than this many seconds
+profile_slow_jobs = float(os.environ.get("profile_slow_jobs", 0))
+profile_dir = os.environ.get("profile_dir", "profiles")
+
+_job = contextvars.ContextVar("metrics_job", default=None)
+_span = contextvars.ContextVar("metrics_span", default=None)
+
+lock = threading.Lock()
+stage_seconds = defaultdict(float)
+stage_count = Counter()
+counters = Counter()
+results = Counter()
+
+
+def new_span(name: str):
+    return {"name": name, "seconds": 0.0, "children": []}
+
+
+@contextlib.contextmanager
+def span(name: str):
+    parent = _span.get()
+    record = new_span(name)
+    if parent is not None:
+        parent["children"].append(record)
+    token = _span.set(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["seconds"] = time.perf_counter() - start
+        _span.reset(token)
+        if _job.get() is None:
+            # outside any job, straight into the totals
+            with lock:
+                stage_seconds[name] += record["seconds"]
+                stage_count[name] += 1
+
+
+def count(name: str, value: int = 1):
+    record = _job.get()
+    if record is None:
+        with lock:
+            counters[name] += value
+    else:
+        record["counters"][name] = record["counters"].get(name, 0) + value
+
+
+def merge(record: Dict):
+    # a record from a render process, under the current span
+    if record is None:
+        return
+    parent = _span.get()
+    if parent is not None:
+        parent["children"].extend(record["spans"]["children"])
+    for name, value in record["counters"].items():
+        count(name, value)
+
+
+@contextlib.contextmanager
+def job(job_id: str, report: bool = True, profile: bool = False):
+    # report: log the record and add it to the totals when the job ends;
+    # render processes leave that to the worker they return the record to
+    root = new_span("job")
+    record = {
+        "job": job_id,
+        "pid": os.getpid(),
+        "started": time.time(),
+        "result": "done",
+        "spans": root,
+        "counters": {},
+    }
+    job_token = _job.set(record)
+    span_token = _span.set(root)
+    profiler = None
+    if profile and profile_slow_jobs > 0:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record["result"] = "failed"
+        record["error"] = str(e)
+        raise
+    finally:
+        root["seconds"] = time.perf_counter() - start
+        _span.reset(span_token)
+        _job.reset(job_token)
+        if profiler is not None:
+            profiler.disable()
+            if root["seconds"] >= profile_slow_jobs:
+                os.makedirs(profile_dir, exist_ok=True)
+                path = os.path.join(profile_dir, f"{job_id}-{os.getpid()}.prof")
+                profiler.dump_stats(path)
+                record["profile"] = path
+        if report:
+            finish(record)
+
+
+def add_spans(spans: Dict):
+    for child in spans["children"]:
+        stage_seconds[child["name"]] += child["seconds"]
+        stage_count[child["name"]] += 1
+        add_spans(child)
+
+
+def finish(record: Dict):
+    with lock:
+        stage_seconds["job"] += record["spans"]["seconds"]
+        stage_count["job"] += 1
+        add_spans(record["spans"])
+        counters.update(record["counters"])
+        results[record["result"]] += 1
+        if metrics_log:
+            with open(metrics_log, "a") as log:
+                log.write(json.dumps(record) + "\n")
+
+
+def exposition(gauges: Dict[str, float] = None) -> str:
+    # prometheus text format
+    lines = [
+        "# TYPE objection_stage_seconds summary",
+    ]
+    with lock:
+        for name in sorted(stage_seconds):
+            lines.append(
+                f'objection_stage_seconds_sum{{stage="{name}"}} {stage_seconds[name]}'
+            )
+            lines.append(
+                f'objection_stage_seconds_count{{stage="{name}"}} {stage_count[name]}'
+            )
+        lines.append("# TYPE objection_events_total counter")
+        for name in sorted(counters):
+            lines.append(f'objection_events_total{{event="{name}"}} {counters[name]}')
+        lines.append("# TYPE objection_jobs_total counter")
+        for name in sorted(results):
+            lines.append(f'objection_jobs_total{{result="{name}"}} {results[name]}')
+    for name, value in sorted((gauges or {}).items()):
+        lines.append(f"# TYPE objection_{name} gauge")
+        lines.append(f"objection_{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    # python metrics.py [jobs.jsonl]: mean seconds per stage
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else metrics_log
+    with open(path, "r") as log:
+        for line in log:
+            record = json.loads(line)
+            stage_seconds["job"] += record["spans"]["seconds"]
+            stage_count["job"] += 1
+            add_spans(record["spans"])
+            results[record["result"]] += 1
+    print(dict(results))
+    for name in sorted(stage_seconds, key=stage_seconds.get, reverse=True):
+        print(f"{name:16} {stage_seconds[name] / stage_count[name]:8.3f} s/call")
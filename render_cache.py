@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+import asset_pack
+import metrics
+
+# finished videos by a hash of the scene config they were rendered from, so a
+# chain summoned again reuses the mp4, or the url it was uploaded to
+default_dir = os.environ.get("render_cache", "render_cache")
+default_max_bytes = int(os.environ.get("render_cache_mb", 2048)) * 1024 * 1024
+# one clip per dialogue line, see anim.render_segments
+segment_dir = os.path.join(default_dir, "segments")
+segment_max_bytes = int(os.environ.get("segment_cache_mb", 1024)) * 1024 * 1024
+
+
+def assets_version():
+    # without a pack the assets can't be fingerprinted cheaply; rebuild the
+    # pack (or clear the cache) after changing them
+    pack = asset_pack.default_pack()
+    return pack.version if pack is not None else "unpacked"
+
+
+def config_key(config: List[Dict], **settings) -> str:
+    # enums serialise as their int values
+    data = json.dumps(
+        {"config": config, "assets": assets_version(), "settings": settings},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    def __init__(
+        self,
+        directory: str = default_dir,
+        max_bytes: int = default_max_bytes,
+        name: str = "render_cache",
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.name = name
+        self.lock = threading.Lock()
+        self.connection = None
+        self.pid = None
+
+    def db(self):
+        # sqlite connections can't be shared with forked workers
+        if self.connection is None or self.pid != os.getpid():
+            os.makedirs(self.directory, exist_ok=True)
+            self.connection = sqlite3.connect(
+                os.path.join(self.directory, "index.db"),
+                timeout=30,
+                check_same_thread=False,
+            )
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            with self.connection:
+                self.connection.execute(
+                    "CREATE TABLE IF NOT EXISTS renders (key TEXT PRIMARY KEY, "
+                    "size INTEGER NOT NULL, used REAL NOT NULL, url TEXT)"
+                )
+                self.connection.execute(
+                    "CREATE INDEX IF NOT EXISTS renders_used ON renders (used)"
+                )
+                # shared by every worker process, for the hit rate
+                self.connection.execute(
+                    "CREATE TABLE IF NOT EXISTS counters "
+                    "(name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+                )
+            self.pid = os.getpid()
+        return self.connection
+
+    def path(self, key: str):
+        return os.path.join(self.directory, f"{key}.mp4")
+
+    def count(self, db, name: str):
+        db.execute(
+            "INSERT INTO counters VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def lookup(self, key: str) -> Optional[Dict]:
+        # the entry for key, counted as a hit or a miss
+        with self.lock:
+            db = self.db()
+            with db:
+                row = db.execute(
+                    "SELECT size, url FROM renders WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] is None:
+                    if not os.path.exists(self.path(key)):
+                        db.execute("DELETE FROM renders WHERE key = ?", (key,))
+                        row = None
+                if row is None:
+                    self.count(db, "misses")
+                    metrics.count(f"{self.name}_misses")
+                    return None
+                self.count(db, "hits")
+                metrics.count(f"{self.name}_hits")
+                db.execute(
+                    "UPDATE renders SET used = ? WHERE key = ?", (time.time(), key)
+                )
+        return {"size": row[0], "url": row[1]}
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        # link (or copy, across filesystems) the cached video to output_path,
+        # False if it is gone
+        partial = f"{output_path}.part"
+        try:
+            try:
+                os.link(self.path(key), partial)
+            except FileNotFoundError:
+                raise
+            except OSError:
+                shutil.copyfile(self.path(key), partial)
+        except FileNotFoundError:
+            return False
+        os.replace(partial, output_path)
+        return True
+
+    def put(self, key: str, video_path: str):
+        partial = f"{self.path(key)}.{os.getpid()}.part"
+        shutil.copyfile(video_path, partial)
+        os.replace(partial, self.path(key))
+        size = os.path.getsize(self.path(key))
+        with self.lock:
+            db = self.db()
+            with db:
+                db.execute(
+                    "INSERT INTO renders VALUES (?, ?, ?, NULL) ON CONFLICT(key) "
+                    "DO UPDATE SET size = excluded.size, used = excluded.used",
+                    (key, size, time.time()),
+                )
+        self.evict()
+
+    def set_url(self, key: str, url: str):
+        with self.lock:
+            db = self.db()
+            with db:
+                db.execute("UPDATE renders SET url = ? WHERE key = ?", (url, key))
+
+    def evict(self):
+        # least recently used videos go first; entries with an upload url
+        # stay reusable as a url after their file is gone
+        with self.lock:
+            db = self.db()
+            with db:
+                total = db.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM renders WHERE size > 0"
+                ).fetchone()[0]
+                rows = db.execute(
+                    "SELECT key, size, url FROM renders WHERE size > 0 ORDER BY used"
+                ).fetchall()
+                for key, size, url in rows:
+                    if total <= self.max_bytes:
+                        break
+                    try:
+                        os.remove(self.path(key))
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                    if url is None:
+                        db.execute("DELETE FROM renders WHERE key = ?", (key,))
+                    else:
+                        db.execute("UPDATE renders SET size = 0 WHERE key = ?", (key,))
+
+    def stats(self):
+        with self.lock:
+            counters = dict(
+                self.db().execute("SELECT name, value FROM counters").fetchall()
+            )
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total > 0 else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    # python render_cache.py: hit rate across every worker so far
+    print(RenderCache().stats())
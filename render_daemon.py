@@ -0,0 +1,327 @@
+import os
+import sys
+import time
+import shutil
+import asyncio
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, NamedTuple
+from aiohttp import web
+import anim
+import metrics
+import render_cache
+import sentiment
+import uploads
+
+# keeps the renderer loaded for local tools, so a request costs only the render:
+#   python render_daemon.py [render_daemon_workers]
+# then POST a scene config (what do_video takes, with the enums as names or
+# numbers) or a comment chain to /render. Without an output path the video
+# comes back in the response, with one it's written under
+# render_daemon_output_dir:
+#   curl --data '{"config": [...]}' localhost:8765/render > out.mp4
+#   curl --data '{"comments": [{"author": "a", "body": "hi"}],
+#                 "output": "videos/out.mp4"}' localhost:8765/render
+# Renders run in a pool of processes that load spaCy, the fonts, sprites and
+# sounds when they start and keep them between requests.
+
+daemon_host = os.environ.get("render_daemon_host", "127.0.0.1")
+daemon_port = int(os.environ.get("render_daemon_port", 8765))
+# listen on this unix socket instead of host:port
+daemon_socket = os.environ.get("render_daemon_socket")
+daemon_workers = int(os.environ.get("render_daemon_workers", 2))
+# requests waiting for a render process before new ones get a 503
+daemon_queue = int(os.environ.get("render_daemon_queue", 16))
+# requests can only write their videos below this directory
+daemon_output_dir = os.environ.get("render_daemon_output_dir", ".")
+
+cache = render_cache.RenderCache()
+segment_cache = render_cache.RenderCache(
+    render_cache.segment_dir, render_cache.segment_max_bytes, name="segment_cache"
+)
+
+
+class Author(NamedTuple):
+    name: str
+
+
+class Comment(NamedTuple):
+    # the fields anim reads from a praw comment
+    author: Author
+    body: str
+    score: int = 0
+
+
+def inside(directory: str, path: str) -> str:
+    # path resolved against directory, which it may not lead out of, through
+    # .. or by being absolute
+    directory = os.path.realpath(directory)
+    resolved = os.path.realpath(os.path.join(directory, path))
+    if os.path.commonpath([directory, resolved]) != directory:
+        raise ValueError(f"{path} is outside {directory}")
+    return resolved
+
+
+def parse_config(config: List[Dict]):
+    # json has no enums, take their names or numbers
+    def member(enum, value):
+        return enum[value.upper()] if isinstance(value, str) else enum(value)
+
+    for scene in config:
+        scene["location"] = member(anim.Location, scene["location"])
+        if "audio" in scene:
+            # anim plays assets/{audio}.mp3
+            if not isinstance(scene["audio"], str):
+                raise ValueError("audio has to be a name")
+            inside("assets", f"{scene['audio']}.mp3")
+        for obj in scene["scene"]:
+            if "character" in obj:
+                obj["character"] = member(anim.Character, obj["character"])
+            if "action" in obj:
+                obj["action"] = member(anim.Action, obj["action"])
+            if "emotion" in obj:
+                # part of a sprite's file name
+                emotion = obj["emotion"]
+                if not isinstance(emotion, str) or os.path.basename(emotion) != emotion:
+                    raise ValueError(f"bad emotion {emotion!r}")
+    return config
+
+
+def parse_comments(comments: List[Dict]):
+    return [
+        Comment(Author(comment["author"]), comment["body"], comment.get("score", 0))
+        for comment in comments
+    ]
+
+
+def warm():
+    # runs once in every render process, before its first request
+    try:
+        anim.get_nlp()
+    except OSError as e:
+        # no spaCy model, only configs can be rendered
+        print(e)
+    sentiment.default_analyzer()
+    for size in (12, 15):
+        anim.get_font("assets/igiari/Igiari.ttf", size)
+    for path in anim.location_map.values():
+        bg = anim.AnimImg(path)
+    anim.AnimImg("assets/arrow.png", x=235, y=170, w=15, h=15, key_x=5)
+    anim.AnimImg("assets/textbox4.png", w=bg.w)
+    anim.AnimImg("assets/objection.gif")
+    for character, _dir in anim.character_map.items():
+        for suffix in ("(a)", "(b)"):
+            path = f"{_dir}/{str(character).lower()}-normal{suffix}.gif"
+            if os.path.isfile(path):
+                anim.AnimImg(path, half_speed=True)
+    for path in (
+        "assets/sfx general/sfx-blink.wav",
+        "assets/sfx general/sfx-fwashing.wav",
+        *anim.objection_sounds.values(),
+        anim.default_objection_sound,
+        "assets/03 - Turnabout Courtroom - Trial.mp3",
+        "assets/08 - Pressing Pursuit _ Cornered.mp3",
+    ):
+        anim.load_clip(path)
+    anim.load_long_bip()
+
+
+def render_request(
+    config: List[Dict],
+    comments: List[Comment],
+    seed: int,
+    engine: str,
+    output_filename: str,
+):
+    # runs in the process pool, returns the metrics for the daemon to merge
+    job_id = os.path.splitext(os.path.basename(output_filename))[0]
+    with metrics.job(job_id, report=False) as record:
+        context = anim.RenderContext(seed)
+        if config is None:
+            most_common = anim.most_common_authors(comments)
+            with metrics.span("config"):
+                characters = anim.get_characters(most_common, context=context)
+                config = anim.comments_to_config(comments, characters, context=context)
+        key = render_cache.config_key(config, fps=anim.fps, seed=seed, engine=engine)
+        if cache.lookup(key) is None or not cache.fetch(key, output_filename):
+            anim.ace_attorney_anim(
+                config,
+                output_filename=output_filename,
+                engine=engine,
+                segment_cache=segment_cache,
+                context=context,
+            )
+            cache.put(key, output_filename)
+    return record
+
+
+class RenderDaemon:
+    def __init__(self, n_workers: int = daemon_workers, max_queued: int = daemon_queue):
+        self.n_workers = n_workers
+        self.max_queued = max_queued
+        self.executor = ProcessPoolExecutor(n_workers, initializer=warm)
+        self.slots = None
+        self.running = 0
+        self.waiting = 0
+        self.done = 0
+        self.failed = 0
+
+    def parse(self, body: Dict):
+        if not isinstance(body, dict):
+            raise ValueError("expected a json object")
+        config, comments = body.get("config"), body.get("comments")
+        if (config is None) == (comments is None):
+            raise ValueError("expected one of config or comments")
+        # the same request gets the same video, and so hits the cache
+        seed = body.get("seed")
+        if seed is None:
+            seed = int(render_cache.config_key([config, comments])[:8], 16)
+        if config is not None:
+            config = parse_config(config)
+        else:
+            comments = parse_comments(comments)
+        engine = body.get("engine", "pil")
+        if engine not in ("pil", "numpy"):
+            raise ValueError(f"unknown engine {engine}")
+        return config, comments, int(seed), engine
+
+    async def render(self, request):
+        try:
+            body = await request.json()
+            config, comments, seed, engine = self.parse(body)
+            output = body.get("output")
+            if output is not None:
+                output_filename = inside(daemon_output_dir, output)
+                os.makedirs(os.path.dirname(output_filename), exist_ok=True)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            return web.json_response({"error": str(e)}, status=400)
+        except OSError as e:
+            # say a file is in the way of the directory
+            return web.json_response(
+                {"error": f"can't write {output}: {e.strerror}"}, status=400
+            )
+        # nothing may await between this check and taking a place in the
+        # queue, or requests arriving together would all get past it
+        if self.slots.locked() and self.waiting >= self.max_queued:
+            return web.json_response(
+                {"error": "queue full"}, status=503, headers={"Retry-After": "5"}
+            )
+        job_dir = None
+        if output is None:
+            job_dir = tempfile.mkdtemp(dir=".")
+            output_filename = os.path.join(job_dir, f"{seed}.mp4")
+        start = time.perf_counter()
+        try:
+            self.waiting += 1
+            try:
+                await self.slots.acquire()
+            finally:
+                self.waiting -= 1
+            self.running += 1
+            try:
+                with metrics.job(os.path.basename(output_filename)):
+                    loop = asyncio.get_running_loop()
+                    executor = self.executor
+                    with metrics.span("render"):
+                        record = await loop.run_in_executor(
+                            executor,
+                            render_request,
+                            config,
+                            comments,
+                            seed,
+                            engine,
+                            output_filename,
+                        )
+                        metrics.merge(record)
+            except BrokenProcessPool as e:
+                # a render process died, which fails every request running on
+                # its pool; the first of them swaps in a fresh one
+                if self.executor is executor:
+                    executor.shutdown(wait=False)
+                    self.executor = ProcessPoolExecutor(
+                        self.n_workers, initializer=warm
+                    )
+                self.failed += 1
+                return web.json_response({"error": str(e)}, status=500)
+            except Exception as e:
+                self.failed += 1
+                return web.json_response({"error": str(e)}, status=500)
+            finally:
+                self.running -= 1
+                self.slots.release()
+            self.done += 1
+            seconds = time.perf_counter() - start
+            if output is not None:
+                return web.json_response(
+                    {"output": output_filename, "seconds": seconds}
+                )
+            response = web.StreamResponse(
+                headers={
+                    "Content-Type": "video/mp4",
+                    "Content-Length": str(os.path.getsize(output_filename)),
+                    "X-Render-Seconds": f"{seconds:.3f}",
+                }
+            )
+            await response.prepare(request)
+            async for data in uploads.read_file(output_filename):
+                await response.write(data)
+            await response.write_eof()
+            return response
+        finally:
+            if job_dir is not None:
+                shutil.rmtree(job_dir, ignore_errors=True)
+
+    def stats(self):
+        return {
+            "workers": self.n_workers,
+            "running": self.running,
+            "waiting": self.waiting,
+            "max_queued": self.max_queued,
+            "done": self.done,
+            "failed": self.failed,
+            "render_cache_hit_rate": cache.stats()["hit_rate"],
+            "segment_cache_hit_rate": segment_cache.stats()["hit_rate"],
+        }
+
+    async def status(self, request):
+        return web.json_response(self.stats())
+
+    async def scrape(self, request):
+        gauges = {
+            f"render_daemon_{name}": value for name, value in self.stats().items()
+        }
+        return web.Response(text=metrics.exposition(gauges), content_type="text/plain")
+
+    async def serve(self, host: str = daemon_host, port: int = daemon_port, path=None):
+        self.slots = asyncio.Semaphore(self.n_workers)
+        # start the processes now, so they warm up before the first request
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(loop.run_in_executor(self.executor, int) for _ in range(self.n_workers))
+        )
+        app = web.Application()
+        app.router.add_post("/render", self.render)
+        app.router.add_get("/status", self.status)
+        app.router.add_get("/metrics", self.scrape)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        if path is not None:
+            site = web.UnixSite(runner, path)
+        else:
+            site = web.TCPSite(runner, host, port)
+        await site.start()
+        print(f"rendering with {self.n_workers} workers on {site.name}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+            self.executor.shutdown()
+
+
+def main(n_workers: int = daemon_workers):
+    asyncio.run(RenderDaemon(n_workers).serve(path=daemon_socket))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else daemon_workers)
@@ -0,0 +1,160 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple
+
+# a handful of very common function words per language, enough to tell the
+# languages reddit comments usually come in apart without a network call
+stopwords = {
+    "en": "the and is are was were you that this it not have with for of to".split(),
+    "es": "el la los las que es por para una con pero como del muy esto".split(),
+    "fr": "le la les est une des que pas pour avec dans mais sur vous je".split(),
+    "de": "der die das und ist nicht ein eine ich mit auch auf den zu sie".split(),
+    "pt": "o os que não uma com para por mas como isso você muito está".split(),
+    "it": "il che non una per con sono della come questo anche ma gli".split(),
+    "nl": "de het een en is niet dat van ik je met zijn maar voor ook".split(),
+}
+stopwords = {language: set(words) for language, words in stopwords.items()}
+
+word_re = re.compile(r"\w+", re.UNICODE)
+# stopwords another language needs over the default one before it wins;
+# "die", "la", "is" or "en" turn up in english comments too
+language_margin = 2
+
+
+def detect_language(text: str, default: str = "en"):
+    words = word_re.findall(text.lower())
+    if len(text) < 3 or len(words) == 0:
+        return default
+    scores = {
+        language: sum(word in language_words for word in words)
+        for language, language_words in stopwords.items()
+    }
+    language = max(scores, key=scores.get)
+    if scores[language] - scores.get(default, 0) < language_margin:
+        return default
+    return language
+
+
+def textblob_polarity(text: str):
+    from textblob import TextBlob
+
+    # PatternAnalyzer, TextBlob's default, scores from a bundled lexicon
+    return TextBlob(text).sentiment.polarity
+
+
+class SentimentAnalyzer:
+    name = "base"
+
+    def analyze(self, text: str) -> Tuple[str, float]:
+        raise NotImplementedError
+
+
+class OfflineSentiment(SentimentAnalyzer):
+    # language from detect_language, polarity from a per language lexicon
+    # scorer; languages without one go through the english lexicon, which
+    # still picks up emoticons, loanwords and swearing
+    name = "offline-v2"
+
+    def __init__(
+        self,
+        lexicons: Dict[str, Callable[[str], float]] = None,
+        fallback: str = "en",
+    ):
+        self.lexicons = lexicons if lexicons is not None else {"en": textblob_polarity}
+        self.fallback = fallback
+
+    def analyze(self, text: str):
+        language = detect_language(text)
+        lexicon = self.lexicons.get(language, self.lexicons[self.fallback])
+        return language, lexicon(text)
+
+
+class CachedSentiment(SentimentAnalyzer):
+    # (language, polarity) per comment text hash, kept in sqlite so comments
+    # that show up again in overlapping threads are scored for free
+    def __init__(
+        self, analyzer: SentimentAnalyzer, path: str = None, max_memory: int = 100000
+    ):
+        self.analyzer = analyzer
+        self.name = analyzer.name
+        self.path = path
+        self.memory = OrderedDict()
+        self.max_memory = max_memory
+        self.lock = threading.Lock()
+        self.connection = None
+        self.pid = None
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text: str):
+        return hashlib.sha1(f"{self.name}\0{text}".encode("utf-8")).hexdigest()
+
+    def db(self):
+        # sqlite connections can't be shared with forked workers
+        if self.path is None:
+            return None
+        if self.connection is None or self.pid != os.getpid():
+            # shared by the worker's render processes, which write to it at
+            # the same time
+            self.connection = sqlite3.connect(
+                self.path, timeout=30, check_same_thread=False
+            )
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            with self.connection:
+                self.connection.execute(
+                    "CREATE TABLE IF NOT EXISTS sentiment "
+                    "(hash TEXT PRIMARY KEY, language TEXT, polarity REAL)"
+                )
+            self.pid = os.getpid()
+        return self.connection
+
+    def remember(self, key: str, result: Tuple[str, float]):
+        self.memory[key] = result
+        if len(self.memory) > self.max_memory:
+            self.memory.popitem(last=False)
+
+    def analyze(self, text: str):
+        key = self.key(text)
+        with self.lock:
+            if key in self.memory:
+                self.hits += 1
+                self.memory.move_to_end(key)
+                return self.memory[key]
+            db = self.db()
+            row = None
+            if db is not None:
+                row = db.execute(
+                    "SELECT language, polarity FROM sentiment WHERE hash = ?", (key,)
+                ).fetchone()
+            if row is not None:
+                self.hits += 1
+                self.remember(key, (row[0], row[1]))
+                return row[0], row[1]
+        self.misses += 1
+        result = self.analyzer.analyze(text)
+        with self.lock:
+            self.remember(key, result)
+            db = self.db()
+            if db is not None:
+                with db:
+                    db.execute(
+                        "INSERT OR REPLACE INTO sentiment VALUES (?, ?, ?)",
+                        (key, *result),
+                    )
+        return result
+
+
+_default_analyzer = None
+
+
+def default_analyzer():
+    global _default_analyzer
+    if _default_analyzer is None:
+        _default_analyzer = CachedSentiment(
+            OfflineSentiment(), os.environ.get("sentiment_cache", "sentiment.db")
+        )
+    return _default_analyzer
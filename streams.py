@@ -0,0 +1,128 @@
+import os
+import time
+from collections import OrderedDict
+from typing import List
+
+# how many characters of "a+b+c" go into one listing request; reddit starts
+# rejecting much longer paths
+max_group_length = int(os.environ.get("stream_group_length", 2000))
+min_interval = float(os.environ.get("stream_min_interval", 2))
+max_interval = float(os.environ.get("stream_max_interval", 60))
+
+
+def group_subreddits(subreddits: List[str], max_length: int = max_group_length):
+    groups = []
+    group = []
+    length = 0
+    for subreddit in subreddits:
+        extra = len(subreddit) + (1 if len(group) > 0 else 0)
+        if len(group) > 0 and length + extra > max_length:
+            groups.append(group)
+            group = []
+            length = 0
+            extra = len(subreddit)
+        group.append(subreddit)
+        length += extra
+    if len(group) > 0:
+        groups.append(group)
+    return groups
+
+
+class CommentGroup:
+    # one "a+b+c" listing, polled often enough that the newest `limit`
+    # comments always overlap the previous poll: the interval follows an
+    # ewma of the group's comment rate
+    def __init__(
+        self, reddit, subreddits: List[str], limit: int = 100, smoothing: float = 0.3
+    ):
+        self.reddit = reddit
+        self.subreddits = subreddits
+        self.name = "+".join(subreddits)
+        self.limit = limit
+        self.smoothing = smoothing
+        self.rate = None
+        self.interval = min_interval
+        self.next_poll = 0
+        self.last_poll = None
+        self.saturated = 0
+        self.seen = OrderedDict()
+
+    def poll(self, now: float):
+        listing = self.reddit.subreddit(self.name).comments(limit=self.limit)
+        # newest first from reddit, oldest first out of here
+        new = [comment for comment in listing if comment.id not in self.seen][::-1]
+        for comment in new:
+            self.seen[comment.id] = True
+        while len(self.seen) > self.limit * 4:
+            self.seen.popitem(last=False)
+
+        if self.last_poll is not None:
+            rate = len(new) / max(now - self.last_poll, 1e-3)
+            if self.rate is None:
+                self.rate = rate
+            else:
+                self.rate += self.smoothing * (rate - self.rate)
+        self.last_poll = now
+
+        if self.rate is None:
+            interval = min_interval
+        elif self.rate > 0:
+            # aim for half a page of new comments per poll
+            interval = self.limit / 2 / self.rate
+        else:
+            interval = max_interval
+        # a full page means some comments may have been missed
+        self.saturated = self.saturated + 1 if len(new) >= self.limit else 0
+        if self.saturated > 0:
+            interval = min_interval
+        self.interval = min(max(interval, min_interval), max_interval)
+        self.next_poll = now + self.interval
+        return new
+
+
+class MultiStream:
+    # every subreddit in as few listing requests as reddit allows, yielding
+    # new comments oldest first; groups that overflow a page even at the
+    # fastest interval are split in two
+    def __init__(
+        self,
+        reddit,
+        subreddits: List[str],
+        max_length: int = max_group_length,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        self.reddit = reddit
+        self.clock = clock
+        self.sleep = sleep
+        self.groups = [
+            CommentGroup(reddit, group)
+            for group in group_subreddits(subreddits, max_length)
+        ]
+        self.requests = 0
+
+    def split(self, group: CommentGroup):
+        half = len(group.subreddits) // 2
+        self.groups.remove(group)
+        for subreddits in (group.subreddits[:half], group.subreddits[half:]):
+            part = CommentGroup(self.reddit, subreddits, group.limit, group.smoothing)
+            part.next_poll = group.next_poll
+            # start the halves from the comments already seen
+            part.seen = OrderedDict(group.seen)
+            part.last_poll = group.last_poll
+            self.groups.append(part)
+
+    def poll_next(self):
+        group = min(self.groups, key=lambda group: group.next_poll)
+        wait = group.next_poll - self.clock()
+        if wait > 0:
+            self.sleep(wait)
+        self.requests += 1
+        comments = group.poll(self.clock())
+        if group.saturated > 1 and len(group.subreddits) > 1:
+            self.split(group)
+        return comments
+
+    def __iter__(self):
+        while True:
+            yield from self.poll_next()
@@ -0,0 +1,71 @@
+from benchmarks.chains import (
+    StubComment,
+    StubReddit,
+    get_chains,
+    legacy_chain,
+    synthetic_tree,
+)
+from comment_chain import CommentChainResolver
+
+depth = 40
+latency = 0.05
+
+
+def fullnames(chains):
+    return [[comment.fullname for comment in chain] for chain in chains]
+
+
+def test_get_chain_matches_parent_walk_with_fewer_requests():
+    legacy_reddit = StubReddit({}, latency)
+    legacy = [legacy_chain(c) for c in synthetic_tree(legacy_reddit, 20, depth)]
+
+    reddit = StubReddit({}, latency)
+    chains, resolver = get_chains(reddit, synthetic_tree(reddit, 20, depth))
+
+    assert fullnames(chains) == fullnames(legacy)
+    # at most one request per level of each of the 4 trunks, the rest is cached
+    assert reddit.requests <= 4 * depth
+    assert resolver.requests == reddit.requests
+    assert reddit.elapsed < legacy_reddit.elapsed / 3
+    assert resolver.hits > 0
+
+
+def walk(resolver: CommentChainResolver, reddit: StubReddit, comments):
+    # answers each round straight from the stub's comments; returns the
+    # chains and how many rounds it took
+    rounds = 0
+    walk = resolver.walk(comments)
+    try:
+        while True:
+            missing = next(walk)
+            rounds += 1
+            for name in missing:
+                resolver.remember(reddit.comments[name])
+    except StopIteration as done:
+        return done.value, rounds
+
+
+def test_walk_yields_one_batch_per_level_for_all_chains():
+    # the walk itself batches every chain it was given
+    reddit = StubReddit({}, latency)
+    summons = synthetic_tree(reddit, 20, depth)
+    chains, rounds = walk(CommentChainResolver(), reddit, summons)
+    assert rounds <= depth
+    assert reddit.requests == 0
+    assert fullnames(chains) == fullnames(legacy_chain(c) for c in summons)
+
+
+def test_walk_stops_at_the_submission_without_io():
+    reddit = StubReddit({}, latency)
+    top = StubComment(reddit, "top", "t3_post")
+    reddit.comments[top.fullname] = top
+    chains, _ = get_chains(reddit, [top])
+    assert chains == [[top]]
+    assert reddit.requests == 0
+
+
+def test_cache_is_bounded():
+    reddit = StubReddit({}, latency)
+    resolver = CommentChainResolver(cache_size=10)
+    walk(resolver, reddit, synthetic_tree(reddit, 5, depth))
+    assert len(resolver.cache) <= 10
@@ -0,0 +1,32 @@
+import anim
+from benchmarks.segments import synthetic_thread
+
+
+def thread_config(comments, seed: int):
+    context = anim.RenderContext(seed)
+    characters = anim.get_characters(
+        anim.most_common_authors(comments), context=context
+    )
+    # stands in for spaCy and the sentiment analyzer
+    processed = [
+        anim.CommentText([comment.body], "en", len(comment.body) % 3 - 1)
+        for comment in comments
+    ]
+    return anim.comments_to_config(comments, characters, processed, context=context)
+
+
+def without_audio(config):
+    return [{key: scene[key] for key in ("location", "scene")} for scene in config]
+
+
+def test_overlapping_threads_share_their_picks():
+    # a different seed per thread, as the worker derives it from the comments
+    comments = synthetic_thread(12)
+    first = thread_config(comments[:-1], seed=0)
+    second = thread_config(comments[1:], seed=1)
+    assert without_audio(first[1:]) == without_audio(second[:-1])
+
+
+def test_same_seed_same_config():
+    comments = synthetic_thread(8)
+    assert thread_config(comments, seed=3) == thread_config(comments, seed=3)
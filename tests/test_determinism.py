@@ -0,0 +1,40 @@
+import os
+import random
+import shutil
+
+import pytest
+
+import anim
+from benchmarks.determinism import render
+from benchmarks.suite import scenarios, synthetic_chain
+
+
+def can_render():
+    # the assets are resolved from the working directory, like the bots do
+    if not os.path.isfile("assets/textbox4.png") or shutil.which("ffmpeg") is None:
+        return False
+    try:
+        anim.get_nlp()
+    except (ImportError, OSError):
+        return False
+    return True
+
+
+pytestmark = pytest.mark.skipif(
+    not can_render(), reason="needs assets/, ffmpeg and the spaCy model"
+)
+
+
+def test_same_seed_same_video(tmp_path):
+    chain = synthetic_chain(scenarios["shakes"], 0)
+    output_path = str(tmp_path / "output.mp4")
+    digests = set()
+    for idx, engine in enumerate(("pil", "pil", "numpy")):
+        random.seed(idx)
+        digests.add(render(chain, 7, output_path, engine=engine))
+    assert len(digests) == 1
+    random.seed(0)
+    assert render(chain, 7, output_path, workers=2) == render(
+        chain, 7, output_path, workers=2
+    )
+    assert render(chain, 8, output_path) not in digests
@@ -0,0 +1,55 @@
+import multiprocessing
+import time
+
+import jobstore
+from benchmarks.queue import hang
+
+
+def hold(path: str, job_id: str):
+    jobs = jobstore.JobStore(path)
+    process = multiprocessing.Process(target=hang, args=(path,))
+    process.start()
+    while jobs.get(job_id)["state"] != jobstore.RENDERING:
+        time.sleep(0.01)
+    return process
+
+
+def test_requeue_stale_leaves_live_workers_jobs(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    jobs = jobstore.JobStore(path)
+    jobs.add("dead")
+    dead = hold(path, "dead")
+    dead.kill()
+    dead.join()
+    jobs.add("live")
+    live = hold(path, "live")
+    try:
+        assert jobs.requeue_stale(3, 0) == 1
+        assert jobs.get("dead")["state"] == jobstore.QUEUED
+        assert jobs.get("live")["state"] == jobstore.RENDERING
+    finally:
+        live.kill()
+        live.join()
+
+
+def test_job_that_kills_its_worker_fails_after_max_attempts(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    jobs = jobstore.JobStore(path)
+    jobs.add("poison")
+    for attempt in range(1, 4):
+        worker = hold(path, "poison")
+        worker.kill()
+        worker.join()
+        assert jobs.requeue_stale(3, 0) == 1
+        job = jobs.get("poison")
+        assert job["attempts"] == attempt
+    assert job["state"] == jobstore.FAILED
+    assert jobs.requeue_stale(3, 0) == 0
+
+
+def test_full(tmp_path):
+    jobs = jobstore.JobStore(str(tmp_path / "jobs.db"))
+    jobs.add("a")
+    assert not jobs.full(2)
+    jobs.add("b")
+    assert jobs.full(2)
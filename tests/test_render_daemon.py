@@ -0,0 +1,94 @@
+import asyncio
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import anim
+import render_daemon
+
+
+def test_inside(tmp_path):
+    directory = str(tmp_path)
+    assert render_daemon.inside(directory, "videos/out.mp4") == os.path.join(
+        os.path.realpath(directory), "videos", "out.mp4"
+    )
+    for path in ("../out.mp4", "videos/../../out.mp4", "/etc/passwd"):
+        with pytest.raises(ValueError):
+            render_daemon.inside(directory, path)
+
+
+def scene(**kwargs):
+    return [
+        {
+            "location": "courtroom_left",
+            "scene": [{"character": "phoenix", "action": "text", **kwargs}],
+        }
+    ]
+
+
+def test_parse_config_rejects_paths():
+    config = render_daemon.parse_config(scene(emotion="normal"))
+    assert config[0]["location"] == anim.Location.COURTROOM_LEFT
+    with pytest.raises(ValueError):
+        render_daemon.parse_config(scene(emotion="../../../../secret"))
+    bad_audio = scene()
+    bad_audio[0]["audio"] = "../../secret"
+    with pytest.raises(ValueError):
+        render_daemon.parse_config(bad_audio)
+
+
+class Request:
+    def __init__(self, body):
+        self.body = body
+
+    async def json(self):
+        return self.body
+
+
+def test_render_rejects_output_outside_and_full_queue(monkeypatch, tmp_path):
+    monkeypatch.setattr(render_daemon, "daemon_output_dir", str(tmp_path))
+    daemon = render_daemon.RenderDaemon.__new__(render_daemon.RenderDaemon)
+    daemon.max_queued = 0
+    daemon.waiting = 0
+
+    async def post(body):
+        daemon.slots = asyncio.Semaphore(0)
+        return await daemon.render(Request(body))
+
+    body = {"config": scene(), "output": "../out.mp4"}
+    assert asyncio.run(post(body)).status == 400
+    body = {"config": scene(), "output": "out.mp4"}
+    assert asyncio.run(post(body)).status == 503
+
+
+def fake_render(config, comments, seed, engine, output_filename):
+    # what ace_attorney_anim needs from the output's directory
+    tempfile.mkdtemp(dir=os.path.dirname(output_filename))
+    with open(output_filename, "wb") as f:
+        f.write(b"video")
+    return {"counters": {}, "spans": {}}
+
+
+def test_render_creates_the_output_directory(monkeypatch, tmp_path):
+    monkeypatch.setattr(render_daemon, "daemon_output_dir", str(tmp_path))
+    monkeypatch.setattr(render_daemon, "render_request", fake_render)
+    monkeypatch.setattr(render_daemon.metrics, "merge", lambda record: None)
+    daemon = render_daemon.RenderDaemon.__new__(render_daemon.RenderDaemon)
+    daemon.n_workers = 1
+    daemon.max_queued = 1
+    daemon.waiting = daemon.running = daemon.done = daemon.failed = 0
+    (tmp_path / "file").write_bytes(b"")
+
+    async def post(body):
+        daemon.slots = asyncio.Semaphore(1)
+        with ThreadPoolExecutor(1) as daemon.executor:
+            return await daemon.render(Request(body))
+
+    response = asyncio.run(post({"config": scene(), "output": "videos/out.mp4"}))
+    assert response.status == 200
+    assert (tmp_path / "videos" / "out.mp4").read_bytes() == b"video"
+    # a file where the directory should be
+    response = asyncio.run(post({"config": scene(), "output": "file/out.mp4"}))
+    assert response.status == 400
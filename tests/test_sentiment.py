@@ -0,0 +1,30 @@
+import multiprocessing
+
+import pytest
+
+import sentiment
+
+
+def score(args):
+    path, worker = args
+    cached = sentiment.CachedSentiment(sentiment.OfflineSentiment(), path)
+    for idx in range(50):
+        cached.analyze(f"comment {worker} {idx} is great")
+    return cached.misses
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="needs fork"
+)
+def test_cache_shared_by_render_processes(tmp_path):
+    path = str(tmp_path / "sentiment.db")
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        misses = pool.map(score, [(path, worker) for worker in range(8)])
+    assert sum(misses) == 8 * 50
+    cached = sentiment.CachedSentiment(sentiment.OfflineSentiment(), path)
+    # readers don't block the writers
+    assert cached.db().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert cached.analyze("comment 3 7 is great") == (
+        sentiment.OfflineSentiment().analyze("comment 3 7 is great")
+    )
+    assert cached.hits == 1
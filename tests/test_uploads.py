@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import os
+
+import aiohttp
+import pytest
+from aiohttp import web
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+import uploads
+from benchmarks.uploads import mock_server
+
+
+async def upload_all(backend_name: str, paths, monkeypatch, failure_rate: float):
+    app, stored, stats = mock_server(failure_rate)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    monkeypatch.setattr(uploads, "streamable_api_url", f"http://127.0.0.1:{port}")
+    try:
+        async with aiohttp.ClientSession() as session:
+            if backend_name == "streamable":
+                backend = uploads.StreamableUpload(session, "user", "password")
+            else:
+                backend = uploads.HTTPUpload(
+                    session, f"http://127.0.0.1:{port}/files", 256 * 1024
+                )
+            uploader = uploads.Uploader(backend, 2, 20, 0.001, 0.01)
+            await asyncio.gather(*(uploader.upload(path) for path in paths))
+    finally:
+        await runner.cleanup()
+    return stored, uploader
+
+
+@pytest.fixture
+def videos(tmp_path):
+    paths = []
+    for idx in range(6):
+        path = tmp_path / f"video{idx}.mp4"
+        path.write_bytes(os.urandom(512 * 1024))
+        paths.append(str(path))
+    return paths
+
+
+@pytest.mark.parametrize("backend_name", ["streamable", "http"])
+def test_retried_uploads_arrive_intact(backend_name, videos, monkeypatch):
+    stored, uploader = asyncio.run(upload_all(backend_name, videos, monkeypatch, 0.3))
+    assert uploader.retries > 0
+    for path in videos:
+        with open(path, "rb") as f:
+            expected = hashlib.sha1(f.read()).hexdigest()
+        assert hashlib.sha1(stored[os.path.basename(path)]).hexdigest() == expected
+
+
+def test_local_upload(videos, tmp_path):
+    uploader = uploads.Uploader(uploads.LocalUpload(str(tmp_path / "served")))
+    target = asyncio.run(uploader.upload(videos[0]))
+    with open(target, "rb") as copy, open(videos[0], "rb") as original:
+        assert copy.read() == original.read()
+
+
+class Failing(uploads.UploadBackend):
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    async def upload(self, path: str) -> str:
+        self.calls += 1
+        raise self.error
+
+
+def response_error(status: int):
+    url = URL("http://127.0.0.1/upload")
+    info = aiohttp.RequestInfo(url, "POST", CIMultiDictProxy(CIMultiDict()), url)
+    return aiohttp.ClientResponseError(info, (), status=status)
+
+
+@pytest.mark.parametrize(
+    "error", [response_error(400), response_error(404), FileNotFoundError("gone")]
+)
+def test_permanent_errors_are_not_retried(error):
+    backend = Failing(error)
+    uploader = uploads.Uploader(backend, attempts=5, backoff=0)
+    with pytest.raises(type(error)):
+        asyncio.run(uploader.upload("video.mp4"))
+    assert backend.calls == 1 and uploader.retries == 0
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        response_error(503),
+        response_error(429),
+        aiohttp.ServerDisconnectedError(),
+        asyncio.TimeoutError(),
+    ],
+)
+def test_transient_errors_are_retried(error):
+    backend = Failing(error)
+    uploader = uploads.Uploader(backend, attempts=3, backoff=0)
+    with pytest.raises(uploads.UploadError):
+        asyncio.run(uploader.upload("video.mp4"))
+    assert backend.calls == 3 and uploader.retries == 2
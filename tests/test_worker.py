@@ -0,0 +1,73 @@
+import argparse
+import asyncio
+import os
+import time
+
+import pytest
+
+import aioreddit
+import jobstore
+import uploads
+import worker
+from benchmarks import aio
+
+
+@pytest.fixture
+def stand_in_urls(monkeypatch):
+    # the benchmark points the clients at its stand-in; put them back after
+    for module, name in (
+        (aioreddit, "reddit_api_url"),
+        (aioreddit, "reddit_auth_url"),
+        (uploads, "streamable_api_url"),
+    ):
+        monkeypatch.setattr(module, name, getattr(module, name))
+
+
+def test_worker_replies_to_every_job(tmp_path, monkeypatch, stand_in_urls):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(worker, "poll_interval", 0.05)
+    monkeypatch.setattr(aio.fake_render, "seconds", 0.05)
+    args = argparse.Namespace(
+        jobs=6, workers=2, depth=4, latency=0.01, upload_latency=0.05
+    )
+    # run asserts every job was rendered, uploaded and replied to exactly once
+    rate, stats = asyncio.run(aio.run(args, 4, str(tmp_path)))
+    # one lookup per comment at most, the chain is never fetched twice
+    assert stats["info"] <= args.jobs * (args.depth + 1)
+
+
+def crash(comments, output_filename: str):
+    # late enough for every job to have been handed to this pool
+    time.sleep(0.5)
+    os._exit(1)
+
+
+async def crash_all(jobs: jobstore.JobStore, n_jobs: int):
+    app, stats = aio.stand_in(2, 0.01, 0.01)
+    runner = await aio.serve_stand_in(app)
+    for idx in range(n_jobs):
+        jobs.add(f"j{idx}", source="mentions")
+    bench = worker.Worker(jobs, 2, n_jobs, render=crash)
+    try:
+        await bench.serve(drain=True)
+    finally:
+        bench.executor.shutdown()
+        await runner.cleanup()
+
+
+def test_crashed_render_replaces_the_pool_once(tmp_path, monkeypatch, stand_in_urls):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(worker, "poll_interval", 0.05)
+    pools = []
+
+    class Pool(worker.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            pools.append(self)
+
+    monkeypatch.setattr(worker, "ProcessPoolExecutor", Pool)
+    jobs = jobstore.JobStore(str(tmp_path / "jobs.db"))
+    asyncio.run(crash_all(jobs, 4))
+    # every job in flight failed with the broken pool, one of them replaced it
+    assert jobs.counts()[jobstore.QUEUED] == 4
+    assert len(pools) == 2
@@ -0,0 +1,205 @@
+import asyncio
+import os
+import random
+import shutil
+from typing import AsyncIterator
+import aiohttp
+
+# where finished videos go. Every backend streams the file from disk and
+# returns the url to reply with; Uploader adds retries and caps how many run
+# at once.
+#   upload_backend=streamable (default) | local | http
+upload_backend = os.environ.get("upload_backend", "streamable")
+streamable_api_url = os.environ.get("streamable_api_url", "https://api.streamable.com")
+upload_dir = os.environ.get("upload_dir", "uploads")
+upload_url = os.environ.get("upload_url", "")
+upload_chunk_size = int(os.environ.get("upload_chunk_mb", 8)) * 1024 * 1024
+max_uploads = int(os.environ.get("max_uploads", 4))
+upload_attempts = int(os.environ.get("upload_attempts", 5))
+upload_backoff = float(os.environ.get("upload_backoff", 1))
+upload_max_backoff = float(os.environ.get("upload_max_backoff", 60))
+
+read_size = 64 * 1024
+
+
+async def read_file(path: str, start: int = 0, length: int = None) -> AsyncIterator:
+    # a byte range of the file in small reads, so nothing holds the whole
+    # video in memory
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = os.path.getsize(path) - start if length is None else length
+        while remaining > 0:
+            data = f.read(min(read_size, remaining))
+            if len(data) == 0:
+                break
+            remaining -= len(data)
+            yield data
+
+
+class UploadError(Exception):
+    pass
+
+
+def retryable(e: Exception) -> bool:
+    # dropped connections, timeouts and errors on the server's side; a 4xx or
+    # a missing file fails the same way however often it's tried
+    if isinstance(e, aiohttp.ClientResponseError):
+        return e.status >= 500 or e.status == 429
+    return isinstance(
+        e,
+        (
+            aiohttp.ClientConnectionError,
+            aiohttp.ClientPayloadError,
+            asyncio.TimeoutError,
+            ConnectionError,
+        ),
+    )
+
+
+class UploadBackend:
+    name = "backend"
+
+    async def upload(self, path: str) -> str:
+        raise NotImplementedError()
+
+
+class StreamableUpload(UploadBackend):
+    # streamable only takes whole files in one request, so a failure means
+    # starting that file again
+    name = "streamable"
+
+    def __init__(self, session: aiohttp.ClientSession, username: str, password: str):
+        self.session = session
+        self.auth = aiohttp.BasicAuth(username or "", password or "")
+
+    async def upload(self, path: str) -> str:
+        # aiohttp reads an open file in chunks as it sends it
+        with open(path, "rb") as f:
+            form = aiohttp.FormData()
+            form.add_field(
+                "file", f, filename=os.path.basename(path), content_type="video/mp4"
+            )
+            async with self.session.post(
+                f"{streamable_api_url}/upload", data=form, auth=self.auth
+            ) as response:
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+        return f"https://streamable.com/{data['shortcode']}"
+
+
+class LocalUpload(UploadBackend):
+    # copies into a directory some web server already serves
+    name = "local"
+
+    def __init__(self, directory: str = upload_dir, base_url: str = upload_url):
+        self.directory = directory
+        self.base_url = base_url
+
+    def copy(self, path: str):
+        os.makedirs(self.directory, exist_ok=True)
+        target = os.path.join(self.directory, os.path.basename(path))
+        partial = f"{target}.part"
+        with open(path, "rb") as src, open(partial, "wb") as dst:
+            shutil.copyfileobj(src, dst, read_size)
+        os.replace(partial, target)
+        return target
+
+    async def upload(self, path: str) -> str:
+        loop = asyncio.get_running_loop()
+        target = await loop.run_in_executor(None, self.copy, path)
+        if self.base_url == "":
+            return os.path.abspath(target)
+        return f"{self.base_url.rstrip('/')}/{os.path.basename(target)}"
+
+
+class HTTPUpload(UploadBackend):
+    # chunked PUTs with Content-Range to an object store endpoint (a
+    # presigned url or a proxy in front of s3); after a failure it asks the
+    # server how much arrived and carries on from there
+    name = "http"
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        base_url: str = upload_url,
+        chunk_size: int = upload_chunk_size,
+    ):
+        self.session = session
+        self.base_url = base_url.rstrip("/")
+        self.chunk_size = chunk_size
+        self.resumed = 0
+
+    async def received(self, url: str) -> int:
+        async with self.session.head(url) as response:
+            if response.status == 404:
+                return 0
+            response.raise_for_status()
+            return int(response.headers.get("Upload-Offset", 0))
+
+    async def upload(self, path: str) -> str:
+        url = f"{self.base_url}/{os.path.basename(path)}"
+        total = os.path.getsize(path)
+        start = await self.received(url)
+        if start > 0:
+            self.resumed += 1
+        while start < total:
+            length = min(self.chunk_size, total - start)
+            headers = {
+                "Content-Range": f"bytes {start}-{start + length - 1}/{total}",
+                "Content-Length": str(length),
+            }
+            async with self.session.put(
+                url, data=read_file(path, start, length), headers=headers
+            ) as response:
+                response.raise_for_status()
+            start += length
+        return url
+
+
+class Uploader:
+    def __init__(
+        self,
+        backend: UploadBackend,
+        max_concurrent: int = max_uploads,
+        attempts: int = upload_attempts,
+        backoff: float = upload_backoff,
+        max_backoff: float = upload_max_backoff,
+    ):
+        self.backend = backend
+        self.slots = asyncio.Semaphore(max_concurrent)
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retries = 0
+
+    async def upload(self, path: str) -> str:
+        async with self.slots:
+            for attempt in range(self.attempts):
+                try:
+                    return await self.backend.upload(path)
+                except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                    if not retryable(e):
+                        raise
+                    if attempt == self.attempts - 1:
+                        raise UploadError(
+                            f"{self.backend.name} upload of {path} failed: {e}"
+                        ) from e
+                    self.retries += 1
+                    delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+                    await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+
+
+def default_uploader(session: aiohttp.ClientSession) -> Uploader:
+    if upload_backend == "streamable":
+        backend = StreamableUpload(
+            session,
+            os.environ.get("streamable_username"),
+            os.environ.get("streamable_password"),
+        )
+    elif upload_backend == "local":
+        backend = LocalUpload()
+    elif upload_backend == "http":
+        backend = HTTPUpload(session)
+    else:
+        raise ValueError(f"unknown upload_backend {upload_backend!r}")
+    return Uploader(backend)
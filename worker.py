@@ -0,0 +1,220 @@
+import os
+import sys
+import asyncio
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from aiohttp import web
+import anim
+import aioreddit
+import jobstore
+import metrics
+import render_cache
+import uploads
+
+# renders the jobs the bots queue in the job store:
+#   python worker.py [render_workers]
+# alongside bot_streamable.py and/or bot_mentions.py. Reddit calls and uploads
+# run on asyncio, renders in a process pool, so uploads and replies
+# for finished videos never hold up the next render.
+
+reddit_client_id = os.environ.get("reddit_client_id")
+reddit_client_secret = os.environ.get("reddit_client_secret")
+reddit_refresh_token = os.environ.get("reddit_refresh_token")
+
+render_workers = int(os.environ.get("render_workers", 2))
+# jobs fetching, waiting for a render slot or uploading at once
+jobs_in_flight = int(os.environ.get("jobs_in_flight", render_workers * 2))
+max_attempts = int(os.environ.get("render_attempts", 3))
+retry_backoff = float(os.environ.get("render_backoff", 30))
+poll_interval = float(os.environ.get("render_poll", 2))
+
+reply_templates = {
+    "mentions": "[Here's the video!]({url})",
+    "streamable": """[Here's the video!]({url})
+
+                            (btw, I now work on all subreddits if you mention my username directly)""",
+}
+
+
+cache = render_cache.RenderCache()
+segment_cache = render_cache.RenderCache(
+    render_cache.segment_dir, render_cache.segment_max_bytes, name="segment_cache"
+)
+
+
+def chain_seed(comments):
+    # the same chain gets the same characters, emotions and shakes, so
+    # summoning it again hits the render cache
+    ids = ",".join(comment.id for comment in comments)
+    return int(hashlib.sha256(ids.encode()).hexdigest()[:8], 16)
+
+
+def build_video(comments, output_filename: str):
+    most_common = anim.most_common_authors(comments)
+    context = anim.RenderContext(chain_seed(comments))
+    with metrics.span("config"):
+        characters = anim.get_characters(most_common, context=context)
+        config = anim.comments_to_config(comments, characters, context=context)
+    key = render_cache.config_key(config, fps=anim.fps)
+    cached = cache.lookup(key)
+    if cached is not None and cached["url"] is not None:
+        return key, cached["url"]
+    if cached is None or not cache.fetch(key, output_filename):
+        anim.ace_attorney_anim(
+            config,
+            output_filename=output_filename,
+            segment_cache=segment_cache,
+            context=context,
+        )
+        cache.put(key, output_filename)
+    return key, None
+
+
+def render_video(comments, output_filename: str):
+    # runs in the process pool; returns the cache key, the url if this exact
+    # scene was uploaded before, and the metrics for the worker to merge
+    job_id = os.path.splitext(os.path.basename(output_filename))[0]
+    hits, misses = anim.asset_cache.hits, anim.asset_cache.misses
+    with metrics.job(job_id, report=False, profile=True) as record:
+        key, url = build_video(comments, output_filename)
+        metrics.count("asset_cache_hits", anim.asset_cache.hits - hits)
+        metrics.count("asset_cache_misses", anim.asset_cache.misses - misses)
+    return key, url, record
+
+
+class Worker:
+    def __init__(
+        self,
+        jobs: jobstore.JobStore,
+        n_workers: int = render_workers,
+        in_flight: int = jobs_in_flight,
+        render=render_video,
+    ):
+        self.jobs = jobs
+        self.n_workers = n_workers
+        self.in_flight = in_flight
+        self.render = render
+        self.executor = ProcessPoolExecutor(n_workers)
+        self.reddit = None
+        self.uploader = None
+        self.done = 0
+
+    async def render_job(self, job):
+        with metrics.span("fetch_chain"):
+            comment = await self.reddit.comment(job["id"])
+            print(f"doing {comment.id} (https://www.reddit.com{comment.permalink})")
+
+            # handle metadata
+            print(f"handling metadata...")
+            comments = list(reversed(await self.reddit.get_chain(comment)))[:-1]
+
+        # generate video
+        output_filename = f"{comment.id}.mp4"
+        key, url = None, None
+        if job["output"] == output_filename and os.path.exists(output_filename):
+            # rendered on an earlier attempt that failed to upload
+            print(f"reusing video {output_filename}...")
+        else:
+            print(f"generating video {output_filename}...")
+            loop = asyncio.get_running_loop()
+            executor = self.executor
+            with metrics.span("render"):
+                try:
+                    key, url, record = await loop.run_in_executor(
+                        executor, self.render, comments, output_filename
+                    )
+                except BrokenProcessPool:
+                    self.replace_pool(executor)
+                    raise
+                metrics.merge(record)
+
+        if url is None:
+            # upload video
+            print(f"uploading video...")
+            self.jobs.set_state(comment.id, jobstore.UPLOADING, output=output_filename)
+            with metrics.span("upload"):
+                url = await self.uploader.upload(output_filename)
+            metrics.count("bytes_uploaded", os.path.getsize(output_filename))
+            if key is not None:
+                cache.set_url(key, url)
+        else:
+            print(f"already uploaded as {url}")
+        print(url)
+        template = reply_templates.get(job["source"], reply_templates["mentions"])
+        with metrics.span("reply"):
+            await self.reddit.reply(comment.fullname, template.format(url=url))
+
+        self.jobs.set_state(comment.id, jobstore.DONE, output=url)
+        self.done += 1
+        print(f"done {comment.id}")
+
+    def replace_pool(self, broken: ProcessPoolExecutor):
+        # a render process died, which fails every job in flight on its pool;
+        # only the first of them swaps in a fresh one
+        if self.executor is broken:
+            broken.shutdown(wait=False)
+            self.executor = ProcessPoolExecutor(self.n_workers)
+
+    async def run(self, job, slots: asyncio.Semaphore):
+        try:
+            with metrics.job(job["id"]):
+                await self.render_job(job)
+        except Exception as e:
+            print(e)
+            self.jobs.retry(job["id"], str(e), max_attempts, retry_backoff)
+        finally:
+            slots.release()
+
+    async def scrape(self, request):
+        stats = cache.stats()
+        gauges = {"render_cache_hit_rate": stats["hit_rate"]}
+        for state, n_jobs in self.jobs.counts().items():
+            gauges[f"jobs_{state}"] = n_jobs
+        return web.Response(text=metrics.exposition(gauges), content_type="text/plain")
+
+    async def serve_metrics(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self.scrape)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, port=metrics.metrics_port).start()
+        print(f"metrics on :{metrics.metrics_port}/metrics")
+        return runner
+
+    async def serve(self, drain: bool = False):
+        # drain: return once nothing is due instead of waiting for more
+        requeued = self.jobs.requeue_stale(max_attempts, retry_backoff)
+        print(f"starting {self.n_workers} workers, {requeued} jobs were interrupted...")
+        slots = asyncio.Semaphore(self.in_flight)
+        tasks = set()
+        metrics_runner = None
+        if metrics.metrics_port > 0:
+            metrics_runner = await self.serve_metrics()
+        async with aioreddit.new_session() as session:
+            self.reddit = aioreddit.AsyncReddit(
+                session, reddit_client_id, reddit_client_secret, reddit_refresh_token
+            )
+            self.uploader = uploads.default_uploader(session)
+            while True:
+                await slots.acquire()
+                job = self.jobs.claim()
+                if job is None:
+                    slots.release()
+                    tasks = {task for task in tasks if not task.done()}
+                    if drain and len(tasks) == 0:
+                        break
+                    await asyncio.sleep(poll_interval)
+                    continue
+                tasks.add(asyncio.create_task(self.run(job, slots)))
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        self.executor.shutdown()
+
+
+def main(n_workers: int = render_workers):
+    asyncio.run(Worker(jobstore.JobStore(), n_workers).serve())
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else render_workers)